@@ -0,0 +1,37 @@
+"""Add trigram indexes for item search
+
+Revision ID: 3f6c2a9d8e41
+Revises: 1a31ce608336
+Create Date: 2026-10-19 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c2a9d8e41'
+down_revision = '1a31ce608336'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm provides similarity() and the gin_trgm_ops operator class
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.create_index('ix_item_item_name_trgm', 'item', ['item_name'],
+                    postgresql_using='gin', postgresql_ops={'item_name': 'gin_trgm_ops'})
+    op.create_index('ix_item_item_vendor_trgm', 'item', ['item_vendor'],
+                    postgresql_using='gin', postgresql_ops={'item_vendor': 'gin_trgm_ops'})
+    op.create_index('ix_item_item_params_trgm', 'item', ['item_params'],
+                    postgresql_using='gin', postgresql_ops={'item_params': 'gin_trgm_ops'})
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.drop_index('ix_item_item_params_trgm', table_name='item')
+    op.drop_index('ix_item_item_vendor_trgm', table_name='item')
+    op.drop_index('ix_item_item_name_trgm', table_name='item')
+    # ### end Alembic commands ###
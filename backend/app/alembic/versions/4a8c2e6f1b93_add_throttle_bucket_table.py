@@ -0,0 +1,35 @@
+"""Add throttle bucket table
+
+Revision ID: 4a8c2e6f1b93
+Revises: c7d3a9e5f218
+Create Date: 2026-10-22 10:12:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8c2e6f1b93'
+down_revision = 'c7d3a9e5f218'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'throttle_bucket',
+        sa.Column('bucket_key', sqlmodel.sql.sqltypes.AutoString(length=320), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('bucket_key'),
+    )
+    op.create_index(op.f('ix_throttle_bucket_updated_at'), 'throttle_bucket', ['updated_at'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.drop_index(op.f('ix_throttle_bucket_updated_at'), table_name='throttle_bucket')
+    op.drop_table('throttle_bucket')
+    # ### end Alembic commands ###
@@ -0,0 +1,87 @@
+"""Add lab event notify triggers
+
+Revision ID: 5d2f8b1e7c43
+Revises: 1c7e9a3f5b28
+Create Date: 2026-10-20 18:05:21.874310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2f8b1e7c43'
+down_revision = '1c7e9a3f5b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Notifications are only delivered when the writing transaction commits
+    op.execute("""
+        CREATE FUNCTION notify_item_event() RETURNS trigger AS $$
+        DECLARE
+            i item;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                i := OLD;
+            ELSE
+                i := NEW;
+            END IF;
+            IF TG_OP = 'UPDATE' AND NEW.lab_id IS DISTINCT FROM OLD.lab_id THEN
+                PERFORM pg_notify('lab_events', json_build_object(
+                    'type', 'item', 'op', 'DELETE', 'lab_id', OLD.lab_id, 'item_id', OLD.item_id
+                )::text);
+            END IF;
+            PERFORM pg_notify('lab_events', json_build_object(
+                'type', 'item', 'op', TG_OP, 'lab_id', i.lab_id, 'item_id', i.item_id,
+                'quantity', i.quantity
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER item_notify_lab_event
+        AFTER INSERT OR UPDATE OR DELETE ON item
+        FOR EACH ROW EXECUTE FUNCTION notify_item_event()
+    """)
+    op.execute("""
+        CREATE FUNCTION notify_borrowing_event() RETURNS trigger AS $$
+        DECLARE
+            b borrowing;
+            b_lab_id uuid;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                b := OLD;
+            ELSE
+                b := NEW;
+            END IF;
+            SELECT lab_id INTO b_lab_id FROM item WHERE item_id = b.item_id;
+            -- Borrowings removed along with their item are covered by the item's event
+            IF b_lab_id IS NOT NULL THEN
+                PERFORM pg_notify('lab_events', json_build_object(
+                    'type', 'borrowing', 'op', TG_OP, 'lab_id', b_lab_id, 'item_id', b.item_id,
+                    'borrow_id', b.borrow_id, 'borrowed_at', b.borrowed_at,
+                    'returned_at', b.returned_at
+                )::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER borrowing_notify_lab_event
+        AFTER INSERT OR UPDATE OR DELETE ON borrowing
+        FOR EACH ROW EXECUTE FUNCTION notify_borrowing_event()
+    """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.execute('DROP TRIGGER borrowing_notify_lab_event ON borrowing')
+    op.execute('DROP FUNCTION notify_borrowing_event()')
+    op.execute('DROP TRIGGER item_notify_lab_event ON item')
+    op.execute('DROP FUNCTION notify_item_event()')
+    # ### end Alembic commands ###
@@ -0,0 +1,60 @@
+"""Drop table version counters
+
+Revision ID: 6b3e9f1c2d84
+Revises: 4a8c2e6f1b93
+Create Date: 2026-10-23 09:41:18.207355
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '6b3e9f1c2d84'
+down_revision = '4a8c2e6f1b93'
+branch_labels = None
+depends_on = None
+
+COUNTED_TABLES = ['user', 'lab', 'user_lab']
+
+
+def upgrade():
+    # Every insert or delete locked the table's one counter row until commit,
+    # cached counts now follow the statistics collector instead
+    op.execute('DROP TRIGGER user_lab_update_bump_table_version ON user_lab')
+    for table_name in COUNTED_TABLES:
+        op.execute(f'DROP TRIGGER {table_name}_bump_table_version ON "{table_name}"')
+    op.execute('DROP FUNCTION bump_table_version()')
+    op.drop_table('table_version')
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.create_table(
+        'table_version',
+        sa.Column('table_name', sqlmodel.sql.sqltypes.AutoString(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+    op.execute("""
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_version (table_name, version) VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = table_version.version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in COUNTED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table_name}_bump_table_version
+            AFTER INSERT OR DELETE ON "{table_name}"
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+    op.execute("""
+        CREATE TRIGGER user_lab_update_bump_table_version
+        AFTER UPDATE OF user_id, lab_id ON user_lab
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+    """)
+    # ### end Alembic commands ###
@@ -0,0 +1,96 @@
+"""Convert item params to JSONB
+
+Revision ID: 7b1e4d2c9a05
+Revises: 3f6c2a9d8e41
+Create Date: 2026-10-19 11:40:02.118734
+
+"""
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1e4d2c9a05'
+down_revision = '3f6c2a9d8e41'
+branch_labels = None
+depends_on = None
+
+
+def parse_item_params(raw):
+    """
+    Turn the legacy free-text params into an object.
+
+    JSON objects are kept as they are, "key=value" / "key: value" lists separated
+    by commas or semicolons become one entry per pair, anything else is kept
+    under "notes" so no information is lost.
+    """
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = None
+    if isinstance(value, dict):
+        return value
+
+    params = {}
+    for part in re.split(r'[;,]', raw):
+        match = re.match(r'^\s*([^=:]+?)\s*[=:]\s*(.+?)\s*$', part)
+        if not match:
+            return {'notes': raw}
+        params[match.group(1).lower()] = match.group(2)
+    return params
+
+
+def upgrade():
+    # Stage the converted values in a new column, then swap it in
+    op.add_column('item', sa.Column('item_params_json', postgresql.JSONB(), nullable=True))
+
+    conn = op.get_bind()
+    item = sa.table(
+        'item',
+        sa.column('item_id', postgresql.UUID(as_uuid=True)),
+        sa.column('item_params', sa.String()),
+        sa.column('item_params_json', postgresql.JSONB(none_as_null=True)),
+    )
+    rows = conn.execute(
+        sa.select(item.c.item_id, item.c.item_params).where(item.c.item_params.isnot(None))
+    ).all()
+    for item_id, raw in rows:
+        conn.execute(
+            item.update()
+            .where(item.c.item_id == item_id)
+            .values(item_params_json=parse_item_params(raw))
+        )
+
+    op.drop_index('ix_item_item_params_trgm', table_name='item')
+    op.drop_column('item', 'item_params')
+    op.alter_column('item', 'item_params_json', new_column_name='item_params')
+
+    # Containment index for ?param.<name>= filters, trigram index keeps params searchable
+    op.create_index('ix_item_item_params_gin', 'item', ['item_params'],
+                    postgresql_using='gin', postgresql_ops={'item_params': 'jsonb_path_ops'})
+    op.execute(
+        'CREATE INDEX ix_item_item_params_trgm ON item '
+        'USING gin ((item_params::text) gin_trgm_ops)'
+    )
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.drop_index('ix_item_item_params_trgm', table_name='item')
+    op.drop_index('ix_item_item_params_gin', table_name='item')
+    op.alter_column('item', 'item_params',
+               existing_type=postgresql.JSONB(),
+               type_=sqlmodel.sql.sqltypes.AutoString(length=255),
+               postgresql_using='left(item_params::text, 255)',
+               existing_nullable=True)
+    op.create_index('ix_item_item_params_trgm', 'item', ['item_params'],
+                    postgresql_using='gin', postgresql_ops={'item_params': 'gin_trgm_ops'})
+    # ### end Alembic commands ###
@@ -0,0 +1,99 @@
+"""Add change log for lab delta sync
+
+Revision ID: 8e4a6c2f9b17
+Revises: 5d2f8b1e7c43
+Create Date: 2026-10-21 10:26:03.519847
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a6c2f9b17'
+down_revision = '5d2f8b1e7c43'
+branch_labels = None
+depends_on = None
+
+LOGGED_TABLES = ['item', 'borrowing', 'user_lab']
+
+
+def upgrade():
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('tx_id', sa.BigInteger(), nullable=False),
+        sa.Column('lab_id', sa.Uuid(), nullable=False),
+        sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+        sa.Column('entity_id', sa.Uuid(), nullable=False),
+        sa.Column('op', sqlmodel.sql.sqltypes.AutoString(length=6), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('seq'),
+    )
+    op.create_index('ix_change_log_lab_id_tx_id_seq', 'change_log', ['lab_id', 'tx_id', 'seq'])
+    op.create_index(op.f('ix_change_log_changed_at'), 'change_log', ['changed_at'], unique=False)
+    op.create_table(
+        'change_log_horizon',
+        sa.Column('horizon_id', sa.Integer(), nullable=False),
+        sa.Column('tx_id', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('horizon_id'),
+    )
+    op.execute('INSERT INTO change_log_horizon (horizon_id, tx_id) VALUES (1, 0)')
+
+    # A row moved to another lab is logged as deleted from the old one
+    op.execute("""
+        CREATE FUNCTION log_lab_change() RETURNS trigger AS $$
+        DECLARE
+            r record;
+            r_id uuid;
+            r_lab_id uuid;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                r := OLD;
+            ELSE
+                r := NEW;
+            END IF;
+            IF TG_TABLE_NAME = 'borrowing' THEN
+                r_id := r.borrow_id;
+                SELECT lab_id INTO r_lab_id FROM item WHERE item_id = r.item_id;
+                -- Borrowings removed along with their item are covered by the item's entry
+                IF r_lab_id IS NULL THEN
+                    RETURN NULL;
+                END IF;
+            ELSE
+                IF TG_TABLE_NAME = 'item' THEN
+                    r_id := r.item_id;
+                ELSE
+                    r_id := r.userlab_id;
+                END IF;
+                r_lab_id := r.lab_id;
+                IF TG_OP = 'UPDATE' AND NEW.lab_id IS DISTINCT FROM OLD.lab_id THEN
+                    INSERT INTO change_log (tx_id, lab_id, entity, entity_id, op)
+                    VALUES (txid_current(), OLD.lab_id, TG_TABLE_NAME, r_id, 'DELETE');
+                END IF;
+            END IF;
+            INSERT INTO change_log (tx_id, lab_id, entity, entity_id, op)
+            VALUES (txid_current(), r_lab_id, TG_TABLE_NAME, r_id, TG_OP);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in LOGGED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table_name}_log_lab_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table_name}
+            FOR EACH ROW EXECUTE FUNCTION log_lab_change()
+        """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    for table_name in LOGGED_TABLES:
+        op.execute(f'DROP TRIGGER {table_name}_log_lab_change ON {table_name}')
+    op.execute('DROP FUNCTION log_lab_change()')
+    op.drop_table('change_log_horizon')
+    op.drop_index(op.f('ix_change_log_changed_at'), table_name='change_log')
+    op.drop_index('ix_change_log_lab_id_tx_id_seq', table_name='change_log')
+    op.drop_table('change_log')
+    # ### end Alembic commands ###
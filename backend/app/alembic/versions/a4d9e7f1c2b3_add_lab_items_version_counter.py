@@ -0,0 +1,50 @@
+"""Add lab items version counter
+
+Revision ID: a4d9e7f1c2b3
+Revises: 7b1e4d2c9a05
+Create Date: 2026-10-19 14:05:47.550291
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e7f1c2b3'
+down_revision = '7b1e4d2c9a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('lab', sa.Column('items_version', sa.Integer(), nullable=False, server_default='0'))
+
+    # Bump the owning lab's counter in the same transaction as every item write,
+    # whichever code path performs it
+    op.execute("""
+        CREATE FUNCTION bump_lab_items_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE lab SET items_version = items_version + 1 WHERE lab_id = OLD.lab_id;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.lab_id IS DISTINCT FROM OLD.lab_id) THEN
+                UPDATE lab SET items_version = items_version + 1 WHERE lab_id = NEW.lab_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER item_bump_lab_items_version
+        AFTER INSERT OR UPDATE OR DELETE ON item
+        FOR EACH ROW EXECUTE FUNCTION bump_lab_items_version()
+    """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.execute('DROP TRIGGER item_bump_lab_items_version ON item')
+    op.execute('DROP FUNCTION bump_lab_items_version()')
+    op.drop_column('lab', 'items_version')
+    # ### end Alembic commands ###
@@ -0,0 +1,56 @@
+"""Add user permissions version
+
+Revision ID: b29e5f7a1d64
+Revises: 8e4a6c2f9b17
+Create Date: 2026-10-21 14:51:37.092215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'b29e5f7a1d64'
+down_revision = '8e4a6c2f9b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('permissions_version', sa.Integer(), nullable=False, server_default='0'))
+
+    # Invalidates the lab permission claims of the user's access tokens, and
+    # evicts the user from the workers' users cache, which holds the version
+    op.execute("""
+        CREATE FUNCTION bump_user_permissions_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE "user" SET permissions_version = permissions_version + 1
+                WHERE user_id = OLD.user_id;
+                PERFORM pg_notify('cache_invalidation',
+                    json_build_object('cache', 'users', 'key', OLD.user_id)::text);
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+                UPDATE "user" SET permissions_version = permissions_version + 1
+                WHERE user_id = NEW.user_id;
+                PERFORM pg_notify('cache_invalidation',
+                    json_build_object('cache', 'users', 'key', NEW.user_id)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER user_lab_bump_user_permissions_version
+        AFTER INSERT OR UPDATE OR DELETE ON user_lab
+        FOR EACH ROW EXECUTE FUNCTION bump_user_permissions_version()
+    """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.execute('DROP TRIGGER user_lab_bump_user_permissions_version ON user_lab')
+    op.execute('DROP FUNCTION bump_user_permissions_version()')
+    op.drop_column('user', 'permissions_version')
+    # ### end Alembic commands ###
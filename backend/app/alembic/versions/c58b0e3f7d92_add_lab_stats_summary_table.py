@@ -0,0 +1,173 @@
+"""Add lab stats summary table
+
+Revision ID: c58b0e3f7d92
+Revises: a4d9e7f1c2b3
+Create Date: 2026-10-19 16:21:09.873402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58b0e3f7d92'
+down_revision = 'a4d9e7f1c2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'lab_stats',
+        sa.Column('lab_id', sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_borrows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('member_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['lab_id'], ['lab.lab_id'], name='lab_stats_lab_id_fkey', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('lab_id'),
+    )
+
+    # Backfill the counters for existing labs
+    op.execute("""
+        INSERT INTO lab_stats (lab_id, item_count, total_quantity, active_borrows, member_count)
+        SELECT
+            lab.lab_id,
+            (SELECT count(*) FROM item WHERE item.lab_id = lab.lab_id),
+            (SELECT coalesce(sum(quantity), 0) FROM item WHERE item.lab_id = lab.lab_id),
+            (SELECT count(*) FROM borrowing JOIN item ON item.item_id = borrowing.item_id
+             WHERE item.lab_id = lab.lab_id AND borrowing.returned_at IS NULL),
+            (SELECT count(*) FROM user_lab WHERE user_lab.lab_id = lab.lab_id)
+        FROM lab
+    """)
+
+    # Every lab gets its stats row on creation, it is removed with the lab
+    op.execute("""
+        CREATE FUNCTION lab_stats_lab() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO lab_stats (lab_id) VALUES (NEW.lab_id);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER lab_stats_lab AFTER INSERT ON lab
+        FOR EACH ROW EXECUTE FUNCTION lab_stats_lab()
+    """)
+
+    # Item inserts and updates adjust item_count and total_quantity, moving an
+    # item to another lab also moves its active borrows
+    op.execute("""
+        CREATE FUNCTION lab_stats_item() RETURNS trigger AS $$
+        DECLARE
+            moved_borrows integer;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE lab_stats
+                SET item_count = item_count + 1, total_quantity = total_quantity + NEW.quantity
+                WHERE lab_id = NEW.lab_id;
+            ELSIF NEW.lab_id IS DISTINCT FROM OLD.lab_id THEN
+                SELECT count(*) INTO moved_borrows FROM borrowing
+                WHERE item_id = NEW.item_id AND returned_at IS NULL;
+                UPDATE lab_stats
+                SET item_count = item_count - 1, total_quantity = total_quantity - OLD.quantity,
+                    active_borrows = active_borrows - moved_borrows
+                WHERE lab_id = OLD.lab_id;
+                UPDATE lab_stats
+                SET item_count = item_count + 1, total_quantity = total_quantity + NEW.quantity,
+                    active_borrows = active_borrows + moved_borrows
+                WHERE lab_id = NEW.lab_id;
+            ELSIF NEW.quantity IS DISTINCT FROM OLD.quantity THEN
+                UPDATE lab_stats
+                SET total_quantity = total_quantity + NEW.quantity - OLD.quantity
+                WHERE lab_id = NEW.lab_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER lab_stats_item AFTER INSERT OR UPDATE ON item
+        FOR EACH ROW EXECUTE FUNCTION lab_stats_item()
+    """)
+
+    # Item deletes run BEFORE the row goes away: the cascaded borrowing deletes
+    # can no longer see the item, so its active borrows are subtracted here
+    op.execute("""
+        CREATE FUNCTION lab_stats_item_delete() RETURNS trigger AS $$
+        BEGIN
+            UPDATE lab_stats
+            SET item_count = item_count - 1, total_quantity = total_quantity - OLD.quantity,
+                active_borrows = active_borrows - (
+                    SELECT count(*) FROM borrowing
+                    WHERE item_id = OLD.item_id AND returned_at IS NULL
+                )
+            WHERE lab_id = OLD.lab_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER lab_stats_item_delete BEFORE DELETE ON item
+        FOR EACH ROW EXECUTE FUNCTION lab_stats_item_delete()
+    """)
+
+    # A borrowing is active while it has no returned_at
+    op.execute("""
+        CREATE FUNCTION lab_stats_borrowing() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.item_id = OLD.item_id
+                    AND (NEW.returned_at IS NULL) = (OLD.returned_at IS NULL) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.returned_at IS NULL THEN
+                UPDATE lab_stats SET active_borrows = active_borrows - 1
+                WHERE lab_id = (SELECT lab_id FROM item WHERE item_id = OLD.item_id);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.returned_at IS NULL THEN
+                UPDATE lab_stats SET active_borrows = active_borrows + 1
+                WHERE lab_id = (SELECT lab_id FROM item WHERE item_id = NEW.item_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER lab_stats_borrowing AFTER INSERT OR UPDATE OR DELETE ON borrowing
+        FOR EACH ROW EXECUTE FUNCTION lab_stats_borrowing()
+    """)
+
+    op.execute("""
+        CREATE FUNCTION lab_stats_member() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE lab_stats SET member_count = member_count - 1 WHERE lab_id = OLD.lab_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE lab_stats SET member_count = member_count + 1 WHERE lab_id = NEW.lab_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER lab_stats_member AFTER INSERT OR DELETE OR UPDATE OF lab_id ON user_lab
+        FOR EACH ROW EXECUTE FUNCTION lab_stats_member()
+    """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.execute('DROP TRIGGER lab_stats_member ON user_lab')
+    op.execute('DROP TRIGGER lab_stats_borrowing ON borrowing')
+    op.execute('DROP TRIGGER lab_stats_item_delete ON item')
+    op.execute('DROP TRIGGER lab_stats_item ON item')
+    op.execute('DROP TRIGGER lab_stats_lab ON lab')
+    op.execute('DROP FUNCTION lab_stats_member()')
+    op.execute('DROP FUNCTION lab_stats_borrowing()')
+    op.execute('DROP FUNCTION lab_stats_item_delete()')
+    op.execute('DROP FUNCTION lab_stats_item()')
+    op.execute('DROP FUNCTION lab_stats_lab()')
+    op.drop_table('lab_stats')
+    # ### end Alembic commands ###
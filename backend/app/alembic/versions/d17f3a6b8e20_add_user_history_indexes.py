@@ -0,0 +1,32 @@
+"""Add indexes for user borrowing history and lab memberships
+
+Revision ID: d17f3a6b8e20
+Revises: c58b0e3f7d92
+Create Date: 2026-10-20 09:48:15.204671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd17f3a6b8e20'
+down_revision = 'c58b0e3f7d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Newest-first keyset pages of a user's borrowings
+    op.create_index('ix_borrowing_user_id_history', 'borrowing',
+                    ['user_id', sa.text("coalesce(borrowed_at, '')"), 'borrow_id'])
+    # Memberships of a user, ordered by lab
+    op.create_index('ix_user_lab_user_id_lab_id', 'user_lab', ['user_id', 'lab_id'])
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.drop_index('ix_user_lab_user_id_lab_id', table_name='user_lab')
+    op.drop_index('ix_borrowing_user_id_history', table_name='borrowing')
+    # ### end Alembic commands ###
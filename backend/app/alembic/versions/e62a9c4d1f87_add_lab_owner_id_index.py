@@ -0,0 +1,28 @@
+"""Add lab owner_id index
+
+Revision ID: e62a9c4d1f87
+Revises: d17f3a6b8e20
+Create Date: 2026-10-20 11:02:36.918240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'e62a9c4d1f87'
+down_revision = 'd17f3a6b8e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Owned half of the owned-or-member lab listing
+    op.create_index(op.f('ix_lab_owner_id'), 'lab', ['owner_id'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.drop_index(op.f('ix_lab_owner_id'), table_name='lab')
+    # ### end Alembic commands ###
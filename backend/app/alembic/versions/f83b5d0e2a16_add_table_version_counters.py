@@ -0,0 +1,61 @@
+"""Add table version counters
+
+Revision ID: f83b5d0e2a16
+Revises: e62a9c4d1f87
+Create Date: 2026-10-20 15:37:52.661093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83b5d0e2a16'
+down_revision = 'e62a9c4d1f87'
+branch_labels = None
+depends_on = None
+
+COUNTED_TABLES = ['user', 'lab', 'user_lab']
+
+
+def upgrade():
+    op.create_table(
+        'table_version',
+        sa.Column('table_name', sqlmodel.sql.sqltypes.AutoString(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+
+    # Statement level, so a bulk insert or delete bumps the counter once
+    op.execute("""
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_version (table_name, version) VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = table_version.version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in COUNTED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table_name}_bump_table_version
+            AFTER INSERT OR DELETE ON "{table_name}"
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+        """)
+    # Moving a membership to another user or lab changes the member lab listings too
+    op.execute("""
+        CREATE TRIGGER user_lab_update_bump_table_version
+        AFTER UPDATE OF user_id, lab_id ON user_lab
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+    """)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    op.execute('DROP TRIGGER user_lab_update_bump_table_version ON user_lab')
+    for table_name in COUNTED_TABLES:
+        op.execute(f'DROP TRIGGER {table_name}_bump_table_version ON "{table_name}"')
+    op.execute('DROP FUNCTION bump_table_version()')
+    op.drop_table('table_version')
+    # ### end Alembic commands ###
@@ -0,0 +1,57 @@
+from collections.abc import Callable, Hashable
+from typing import Any, Literal
+
+from sqlalchemy import Select
+from sqlmodel import Session, func, select
+
+from app import crud
+from app.core.cache import TTLCache
+
+# How a listing computes its total count:
+# - exact: COUNT(*) on every request
+# - cached: COUNT(*) again once the table statistics show inserts or deletes
+# - estimated: planner estimate, table statistics for unfiltered listings
+# - none: no count, for clients paging without totals
+CountStrategy = Literal["exact", "cached", "estimated", "none"]
+
+# Counts per listing scope, stored with the change counter they were computed at
+count_cache: TTLCache[Hashable, tuple[int, int]] = TTLCache(maxsize=4096)
+
+
+def count_rows(
+    *,
+    session: Session,
+    strategy: CountStrategy,
+    statement: Select[Any],
+    cache_key: Hashable,
+    version: Callable[[], int],
+    table_name: str | None = None,
+) -> int | None:
+    """
+    Count the rows returned by `statement` with the requested strategy.
+
+    `version` returns the change counter the cached count is checked against,
+    `table_name` is set when the statement lists a whole table unfiltered so
+    the estimate can come straight from the table statistics.
+    """
+    if strategy == "none":
+        return None
+
+    if strategy == "estimated":
+        if table_name:
+            estimate = crud.estimate_table_rows(session=session, table_name=table_name)
+            if estimate is not None:
+                return estimate
+        return crud.estimate_statement_rows(session=session, statement=statement)
+
+    count_statement = select(func.count()).select_from(statement.subquery())
+    if strategy == "cached":
+        current_version = version()
+        cached = count_cache.get(cache_key)
+        if cached and cached[0] == current_version:
+            return cached[1]
+        count = session.exec(count_statement).one()
+        count_cache.set(cache_key, (current_version, count))
+        return count
+
+    return session.exec(count_statement).one()
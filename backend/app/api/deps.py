@@ -1,3 +1,4 @@
+import uuid
 from collections.abc import Generator
 from typing import Annotated
 
@@ -6,12 +7,17 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session, select
 
+from app import crud
 from app.core import security
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.invalidation import MISSING_USERS_CACHE, USERS_CACHE, bus
+from app.core.replicas import replica_pool, wrote_recently
+from app.models import TokenPayload, UpdateUserLab, User, UserLab
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -26,29 +32,143 @@ def get_db() -> Generator[Session, None, None]:
 SessionDep = Annotated[Session, Depends(get_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
+# Detached copies of recently authenticated users by id, evicted through the
+# invalidation bus whenever a user row is written
+user_cache = bus.register(USERS_CACHE, TTLCache[str, User](maxsize=4096, ttl=300))
+# User ids ("id:<user_id>") and emails ("email:<email>") recently found to have
+# no user, so tokens of deleted users and probes for unknown emails don't each
+# cost a query. An email is evicted through the bus once a user has it
+missing_user_cache = bus.register(
+    MISSING_USERS_CACHE,
+    TTLCache[str, bool](maxsize=16384, ttl=settings.MISSING_USER_CACHE_TTL_SECONDS),
+)
+
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def get_user_cached(session: Session, user_id: str) -> User | None:
+    """
+    Load a user into the session, from the users cache when possible.
+    """
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return session.merge(cached, load=False)
+    missing_key = f"id:{user_id}"
+    if missing_user_cache.get(missing_key):
+        return None
+
+    generation = bus.generation(USERS_CACHE)
+    missing_generation = bus.generation(MISSING_USERS_CACHE)
+    user = session.get(User, user_id)
+    if user is not None:
+        copy = User.model_validate(user.model_dump())
+        make_transient_to_detached(copy)
+        bus.set_if_current(USERS_CACHE, user_id, copy, generation)
+    else:
+        bus.set_if_current(MISSING_USERS_CACHE, missing_key, True, missing_generation)
+    return user
+
+
+def get_user_by_email_cached(session: Session, email: str) -> User | None:
+    """
+    Look up a user by email, answering from the cache of missing users when
+    the email recently had none.
+    """
+    missing_key = f"email:{email}"
+    if missing_user_cache.get(missing_key):
+        return None
+    generation = bus.generation(MISSING_USERS_CACHE)
+    user = crud.get_user_by_email(session=session, email=email)
+    if user is None:
+        bus.set_if_current(MISSING_USERS_CACHE, missing_key, True, generation)
+    return user
+
+
+def get_token_data(token: TokenDep) -> TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+
+
+TokenDataDep = Annotated[TokenPayload, Depends(get_token_data)]
+
+
+def get_current_user(session: SessionDep, token_data: TokenDataDep) -> User:
+    user = get_user_cached(session, token_data.sub) if token_data.sub else None
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    # Lets the session tell which user its writes belong to
+    session.info["user_id"] = str(user.user_id)
     return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+def get_lab_membership(
+    session: SessionDep,
+    current_user: CurrentUser,
+    token_data: TokenDataDep,
+    lab_id: uuid.UUID,
+) -> UpdateUserLab | None:
+    """
+    The current user's permissions in the lab from the path, or None when they
+    are not a member.
+
+    Read from the token's claims while the user's permissions_version still
+    matches them, so the check costs no query; otherwise from the database.
+    """
+    if (
+        token_data.labs is not None
+        and token_data.pv == current_user.permissions_version
+    ):
+        mask = token_data.labs.get(str(lab_id))
+        if mask is None:
+            return None
+        return UpdateUserLab(
+            can_edit_lab=bool(mask & security.CAN_EDIT_LAB),
+            can_edit_items=bool(mask & security.CAN_EDIT_ITEMS),
+            can_edit_users=bool(mask & security.CAN_EDIT_USERS),
+        )
+
+    user_lab = session.exec(
+        select(UserLab).where(
+            UserLab.lab_id == lab_id, UserLab.user_id == current_user.user_id
+        )
+    ).first()
+    return UpdateUserLab.model_validate(user_lab) if user_lab else None
+
+
+LabMembership = Annotated[UpdateUserLab | None, Depends(get_lab_membership)]
+
+
+def get_read_db(
+    session: SessionDep, current_user: CurrentUser
+) -> Generator[Session, None, None]:
+    """
+    A session for read-only routes, on a read replica that is caught up when
+    one is configured, or on the primary for users that wrote recently.
+    """
+    replica = None
+    if not wrote_recently(str(current_user.user_id)):
+        replica = replica_pool.pick()
+    if replica is None:
+        yield session
+        return
+    with Session(replica) as read_session:
+        yield read_session
+
+
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+
+
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
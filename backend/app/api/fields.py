@@ -0,0 +1,97 @@
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from types import GenericAlias
+from typing import Annotated, Any, cast
+
+from fastapi import HTTPException, Query
+from fastapi.responses import Response
+from pydantic import BaseModel, create_model
+from sqlalchemy.orm import InstrumentedAttribute
+
+# Sparse fieldsets: `?fields=item_id,item_name,quantity` makes a listing
+# select and return only those fields of each row
+FieldsQuery = Annotated[
+    str | None,
+    Query(
+        description="Comma separated fields to return for each row, all when omitted"
+    ),
+]
+
+
+def parse_fields(
+    fields: str | None, public_model: type[BaseModel], id_field: str
+) -> tuple[str, ...] | None:
+    """
+    The requested fields of `public_model` in a stable order, always with its
+    id, or None when all fields were requested.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",")} - {""}
+    unknown = requested - public_model.model_fields.keys()
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields: {', '.join(sorted(unknown)) or fields}",
+        )
+    requested.add(id_field)
+    return tuple(name for name in public_model.model_fields if name in requested)
+
+
+def field_columns(
+    table_model: Any, names: tuple[str, ...]
+) -> list[InstrumentedAttribute[Any]]:
+    """
+    The columns of `table_model` to select for the given fields, fields that
+    aren't columns are left out.
+    """
+    columns = []
+    for name in names:
+        column = getattr(table_model, name, None)
+        if isinstance(column, InstrumentedAttribute):
+            columns.append(column)
+    return columns
+
+
+def row_mappings(
+    rows: Sequence[Any], columns: list[InstrumentedAttribute[Any]]
+) -> list[Mapping[str, Any]]:
+    # A single column select returns plain values instead of rows
+    if len(columns) == 1:
+        return [{columns[0].key: value} for value in rows]
+    return [row._mapping for row in rows]
+
+
+@lru_cache(maxsize=256)
+def sparse_page_model(
+    page_model: type[BaseModel], public_model: type[BaseModel], names: tuple[str, ...]
+) -> type[BaseModel]:
+    """
+    `page_model` with its `data` rows narrowed to the given fields of `public_model`.
+    """
+    row_model = create_model(  # type: ignore[call-overload]
+        f"{public_model.__name__}Sparse",
+        **{
+            name: (field.annotation, field)
+            for name, field in public_model.model_fields.items()
+            if name in names
+        },
+    )
+    # Built at runtime, so it can't be spelled `list[row_model]` for mypy
+    rows_type = cast(type[list[Any]], GenericAlias(list, row_model))
+    return create_model(
+        f"{page_model.__name__}Sparse", __base__=page_model, data=(rows_type, ...)
+    )
+
+
+def sparse_response(
+    page_model: type[BaseModel],
+    public_model: type[BaseModel],
+    names: tuple[str, ...],
+    **page: Any,
+) -> Response:
+    """
+    Serialize a page of rows, given as mappings, with only the requested fields.
+    """
+    model = sparse_page_model(page_model, public_model, names)
+    return Response(model(**page).model_dump_json(), media_type="application/json")
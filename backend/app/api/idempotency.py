@@ -0,0 +1,122 @@
+import hashlib
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any
+
+from fastapi import Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, select
+
+from app.core.config import settings
+from app.models import IdempotencyKey
+
+IdempotencyKeyHeader = Annotated[str | None, Header(max_length=255)]
+
+# Share of completed requests that also evict a batch of expired keys
+EVICTION_SAMPLE_RATE = 0.01
+EVICTION_BATCH_SIZE = 1000
+
+
+def request_hash(method: str, path: str, body: BaseModel) -> str:
+    """
+    Fingerprint of a request, a key may only be replayed for the same request.
+    """
+    payload = f"{method} {path}\n{body.model_dump_json()}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def begin_idempotent_request(
+    *, session: Session, user_id: uuid.UUID, key: str | None, fingerprint: str
+) -> JSONResponse | None:
+    """
+    Reserve an idempotency key, or return the stored response of an earlier
+    request made with it.
+
+    The reservation is part of the request's transaction: a concurrent retry
+    blocks on it until the first request commits and then replays its
+    response, and a request that fails leaves no trace so it can be retried.
+    """
+    if key is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    session.exec(
+        delete(IdempotencyKey).where(
+            col(IdempotencyKey.user_id) == user_id,
+            col(IdempotencyKey.key) == key,
+            col(IdempotencyKey.expires_at) <= now,
+        )
+    )
+    reserved = session.exec(
+        insert(IdempotencyKey)
+        .values(
+            user_id=user_id,
+            key=key,
+            request_hash=fingerprint,
+            expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_EXPIRE_HOURS),
+        )
+        .on_conflict_do_nothing()
+        .returning(col(IdempotencyKey.key))
+    ).first()
+    if reserved:
+        return None
+
+    stored = session.exec(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        )
+    ).one()
+    if stored.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    if stored.status_code is None:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+        )
+    return JSONResponse(
+        content=stored.response_body,
+        status_code=stored.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def complete_idempotent_request(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    key: str | None,
+    response: Any,
+    status_code: int = 200,
+) -> None:
+    """
+    Store the response for a reserved key, to be committed with the request's writes.
+    """
+    if key is None:
+        return
+
+    stored = session.get(IdempotencyKey, (user_id, key))
+    if stored is None:
+        return
+    stored.status_code = status_code
+    stored.response_body = jsonable_encoder(response)
+    session.add(stored)
+
+    if random.random() < EVICTION_SAMPLE_RATE:
+        expired = (
+            select(IdempotencyKey.user_id, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+            .limit(EVICTION_BATCH_SIZE)
+        )
+        session.exec(
+            delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired)
+            )
+        )
@@ -1,11 +1,27 @@
 from fastapi import APIRouter
 
-from app.api.routes import items, login, users, utils, labs, borrow
+from app.api.routes import (
+    items,
+    login,
+    users,
+    utils,
+    labs,
+    borrow,
+    search,
+    batch,
+    events,
+    changes,
+)
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
+# search routes must be registered before /labs/{lab_id}/items/{item_id}
+api_router.include_router(search.router, tags=["search"])
 api_router.include_router(items.router, prefix="/labs", tags=["items"])
 api_router.include_router(labs.router, prefix="/labs", tags=["labs"])
 api_router.include_router(borrow.router, prefix="/labs", tags=["borrow"])
+api_router.include_router(batch.router, prefix="/labs", tags=["batch"])
+api_router.include_router(events.router, prefix="/labs", tags=["events"])
+api_router.include_router(changes.router, prefix="/labs", tags=["changes"])
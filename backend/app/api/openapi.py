@@ -0,0 +1,102 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.core.compression import ENCODINGS, compress, negotiate_encoding
+from app.core.config import settings
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header lists the ETag, compared weakly as the
+    header requires.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag.removeprefix("W/")
+        for tag in if_none_match.split(",")
+    )
+
+
+def serialize_openapi(schema: dict[str, Any]) -> bytes:
+    # Same encoding as FastAPI's own openapi.json response
+    return json.dumps(
+        schema, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class OpenAPIDocument:
+    """
+    The app's OpenAPI schema, serialized and compressed once and then served
+    from memory with an ETag.
+    """
+
+    def __init__(self) -> None:
+        self.body: bytes | None = None
+        # Compressed bodies by content encoding
+        self.encoded: dict[str, bytes] = {}
+        self.etag = ""
+
+    def set_body(self, body: bytes) -> None:
+        self.encoded = {
+            encoding: compress(body, encoding, gzip_level=9, brotli_quality=11)
+            for encoding in ENCODINGS
+        }
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.body = body
+
+    def build(self, app: FastAPI) -> None:
+        self.set_body(serialize_openapi(app.openapi()))
+
+    def load(self, app: FastAPI, path: Path) -> None:
+        """
+        Serve a schema written by app/build_openapi.py instead of generating it.
+        """
+        body = path.read_bytes()
+        app.openapi_schema = json.loads(body)
+        self.set_body(body)
+
+    def prepare(self, app: FastAPI) -> None:
+        if settings.OPENAPI_FILE:
+            self.load(app, Path(settings.OPENAPI_FILE))
+        else:
+            self.build(app)
+
+    async def endpoint(self, request: Request) -> Response:
+        if self.body is None:
+            self.build(request.app)
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match", ""), self.etag):
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            return Response(
+                self.encoded[encoding], media_type="application/json", headers=headers
+            )
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+openapi_document = OpenAPIDocument()
+
+
+def serve_cached_openapi(app: FastAPI) -> None:
+    """
+    Answer the app's openapi_url from `openapi_document`.
+    """
+    assert app.openapi_url is not None
+    # Routes match in order, this one shadows the one FastAPI generates from
+    app.router.routes.insert(
+        0, Route(app.openapi_url, openapi_document.endpoint, include_in_schema=False)
+    )
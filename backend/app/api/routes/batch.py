@@ -0,0 +1,223 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, select
+
+from app.api.deps import CurrentUser, LabMembership, SessionDep
+from app.models import (
+    BatchAddMember,
+    BatchCreateItem,
+    BatchDeleteItem,
+    BatchOperationResult,
+    BatchRemoveMember,
+    BatchRequest,
+    BatchResults,
+    BatchUpdateItem,
+    BatchUpdateMember,
+    Item,
+    ItemPublic,
+    Lab,
+    User,
+    UserLab,
+)
+
+router = APIRouter()
+
+ITEM_OPS = (BatchCreateItem, BatchUpdateItem, BatchDeleteItem)
+MEMBER_OPS = (BatchAddMember, BatchUpdateMember, BatchRemoveMember)
+
+
+class BatchContext:
+    """
+    Rows the operations of one batch work on, loaded up front with one query each.
+    """
+
+    def __init__(
+        self, session: Session, lab_id: uuid.UUID, batch_in: BatchRequest
+    ) -> None:
+        self.session = session
+        self.lab_id = lab_id
+
+        item_ids = {
+            op.item_id
+            for op in batch_in.operations
+            if isinstance(op, BatchUpdateItem | BatchDeleteItem)
+        }
+        self.items: dict[uuid.UUID, Item] = {}
+        if item_ids:
+            items = session.exec(
+                select(Item).where(
+                    col(Item.item_id).in_(item_ids), Item.lab_id == lab_id
+                )
+            ).all()
+            self.items = {item.item_id: item for item in items}
+
+        emails = {op.email for op in batch_in.operations if isinstance(op, MEMBER_OPS)}
+        self.users: dict[str, User] = {}
+        self.user_labs: dict[uuid.UUID, UserLab] = {}
+        if emails:
+            users = session.exec(select(User).where(col(User.email).in_(emails))).all()
+            self.users = {user.email: user for user in users}
+            user_labs = session.exec(
+                select(UserLab).where(
+                    UserLab.lab_id == lab_id,
+                    col(UserLab.user_id).in_([user.user_id for user in users]),
+                )
+            ).all()
+            self.user_labs = {user_lab.user_id: user_lab for user_lab in user_labs}
+
+    def get_item(self, item_id: uuid.UUID) -> Item:
+        item = self.items.get(item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    def get_user(self, email: str) -> User:
+        user = self.users.get(email)
+        if not user:
+            raise HTTPException(
+                status_code=404, detail=f"User with email {email} not found"
+            )
+        return user
+
+
+def run_operation(ctx: BatchContext, index: int, op: Any) -> BatchOperationResult:
+    session = ctx.session
+    if isinstance(op, BatchCreateItem):
+        item = Item.model_validate(op.item_in, update={"lab_id": ctx.lab_id})
+        session.add(item)
+        session.flush()
+        ctx.items[item.item_id] = item
+        return BatchOperationResult(
+            index=index, status_code=200, item=ItemPublic.model_validate(item)
+        )
+
+    if isinstance(op, BatchUpdateItem):
+        item = ctx.get_item(op.item_id)
+        update_dict = op.item_in.model_dump(exclude_unset=True)
+        update_dict.pop("lab_id", None)
+        item.sqlmodel_update(update_dict)
+        session.add(item)
+        session.flush()
+        return BatchOperationResult(
+            index=index, status_code=200, item=ItemPublic.model_validate(item)
+        )
+
+    if isinstance(op, BatchDeleteItem):
+        item = ctx.get_item(op.item_id)
+        session.delete(item)
+        session.flush()
+        del ctx.items[op.item_id]
+        return BatchOperationResult(
+            index=index, status_code=200, detail="Item deleted successfully"
+        )
+
+    user = ctx.get_user(op.email)
+    user_lab = ctx.user_labs.get(user.user_id)
+
+    if isinstance(op, BatchAddMember):
+        if user_lab:
+            raise HTTPException(
+                status_code=400,
+                detail=f"User with email {user.email} is already associated with this lab",
+            )
+        user_lab = UserLab(
+            user_id=user.user_id,
+            lab_id=ctx.lab_id,
+            can_edit_lab=op.can_edit_lab,
+            can_edit_items=op.can_edit_items,
+            can_edit_users=op.can_edit_users,
+        )
+        session.add(user_lab)
+        session.flush()
+        ctx.user_labs[user.user_id] = user_lab
+        return BatchOperationResult(
+            index=index, status_code=200, detail="User added to lab successfully"
+        )
+
+    if not user_lab:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User with email {user.email} is not associated with this lab",
+        )
+
+    if isinstance(op, BatchUpdateMember):
+        user_lab.can_edit_lab = op.can_edit_lab
+        user_lab.can_edit_items = op.can_edit_items
+        user_lab.can_edit_users = op.can_edit_users
+        session.add(user_lab)
+        session.flush()
+        return BatchOperationResult(
+            index=index, status_code=200, detail="User permissions updated successfully"
+        )
+
+    session.delete(user_lab)
+    session.flush()
+    del ctx.user_labs[user.user_id]
+    return BatchOperationResult(
+        index=index, status_code=200, detail="User removed from lab successfully"
+    )
+
+
+@router.post("/{lab_id}/batch", response_model=BatchResults)
+def run_lab_batch(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_lab: LabMembership,
+    lab_id: uuid.UUID,
+    batch_in: BatchRequest,
+) -> Any:
+    """
+    Run an ordered list of item and membership operations on a lab.
+
+    Permissions are checked once for the whole batch and all operations share a
+    single transaction. Each operation runs in its own savepoint, so a failing
+    operation is reported in its result without undoing the others, unless
+    `atomic` is set, in which case any failure rolls back the whole batch.
+    """
+    lab = session.get(Lab, lab_id)
+    if not lab:
+        raise HTTPException(status_code=404, detail="Lab not found")
+
+    if not current_user.is_superuser:
+        needs_items = any(isinstance(op, ITEM_OPS) for op in batch_in.operations)
+        needs_users = any(isinstance(op, MEMBER_OPS) for op in batch_in.operations)
+        if (
+            not user_lab
+            or (needs_items and not user_lab.can_edit_items)
+            or (needs_users and not user_lab.can_edit_users)
+        ):
+            raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    ctx = BatchContext(session, lab_id, batch_in)
+    results = []
+    for index, op in enumerate(batch_in.operations):
+        try:
+            with session.begin_nested():
+                result = run_operation(ctx, index, op)
+        except HTTPException as e:
+            result = BatchOperationResult(
+                index=index, status_code=e.status_code, detail=e.detail
+            )
+        except IntegrityError:
+            result = BatchOperationResult(
+                index=index,
+                status_code=409,
+                detail="Operation conflicts with existing data",
+            )
+        results.append(result)
+
+    if batch_in.atomic and any(result.status_code != 200 for result in results):
+        session.rollback()
+        for result in results:
+            if result.status_code == 200:
+                result.status_code = 424
+                result.detail = "Rolled back because another operation failed"
+                result.item = None
+        return BatchResults(results=results)
+
+    session.commit()
+    return BatchResults(results=results)
@@ -2,33 +2,46 @@ import uuid
 from typing import Any
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from sqlmodel import func, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Borrowing, BorrowItem, UserLab, Lab, Item, Message
+from app.api.deps import CurrentUser, LabMembership, ReadSessionDep, SessionDep
+from app.api.idempotency import (
+    IdempotencyKeyHeader,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    request_hash,
+)
+from app.models import Borrowing, BorrowItem, Lab, Item, Message
 
 router = APIRouter()
 
 @router.post("/{lab_id}/items/{item_id}/borrow", response_model=Message)
 def borrow_item(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_item_in: BorrowItem
+    *, request: Request, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_item_in: BorrowItem,
+    idempotency_key: IdempotencyKeyHeader = None
 ) -> Any:
     """
     Borrow an item from a lab by providing the start and end dates.
+
+    A retry sent with the same `Idempotency-Key` header gets the response of the
+    first request instead of borrowing the item again.
     """
+    replay = begin_idempotent_request(
+        session=session,
+        user_id=current_user.user_id,
+        key=idempotency_key,
+        fingerprint=request_hash("POST", request.url.path, borrow_item_in),
+    )
+    if replay:
+        return replay
+
     # Check if the current user is a member of the lab
     lab = session.get(Lab, lab_id)
     if not lab:
         raise HTTPException(status_code=404, detail="Lab not found")
     
     # Check if the user is a member of the lab and has can_edit_items permission
-    user_lab = session.exec(
-        select(UserLab).where(
-            UserLab.lab_id == lab_id,
-            UserLab.user_id == current_user.user_id
-        )
-    ).first()
     if not user_lab or not user_lab.can_edit_items:
         raise HTTPException(status_code=400, detail="User is not a member of the lab or does not have enough permissions")
 
@@ -70,13 +83,17 @@ def borrow_item(
         system_name=borrow_item_in.system_name
     )
     session.add(borrowing)
+    message = Message(message="Item borrowed successfully")
+    complete_idempotent_request(
+        session=session, user_id=current_user.user_id, key=idempotency_key, response=message
+    )
     session.commit()
 
-    return Message(message="Item borrowed successfully")
+    return message
 
 @router.put("/{lab_id}/items/{item_id}/borrow/{borrow_id}", response_model=Message)
 def update_borrowing(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID, update_borrow_in: BorrowItem
+    *, session: SessionDep, user_lab: LabMembership, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID, update_borrow_in: BorrowItem
 ) -> Any:
     """
     Update the return date, table_name, and system_name of a borrowing.
@@ -87,12 +104,6 @@ def update_borrowing(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     # Check if the user is a member of the lab and has can_edit_items permission
-    user_lab = session.exec(
-        select(UserLab).where(
-            UserLab.lab_id == lab_id,
-            UserLab.user_id == current_user.user_id
-        )
-    ).first()
     if not user_lab or not user_lab.can_edit_items:
         raise HTTPException(status_code=400, detail="User is not a member of the lab or does not have enough permissions")
 
@@ -118,7 +129,7 @@ def update_borrowing(
 
 @router.delete("/{lab_id}/items/{item_id}/borrow/{borrow_id}", response_model=Message)
 def delete_borrowing(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID
+    *, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID
 ) -> Any:
     """
     Delete a borrowing.
@@ -129,12 +140,6 @@ def delete_borrowing(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     # Check if the user is a member of the lab
-    user_lab = session.exec(
-        select(UserLab).where(
-            UserLab.lab_id == lab_id,
-            UserLab.user_id == current_user.user_id
-        )
-    ).first()
     if not user_lab:
         raise HTTPException(status_code=400, detail="User is not a member of the lab")
 
@@ -161,7 +166,7 @@ def delete_borrowing(
 
 @router.get("/{lab_id}/items/{item_id}/borrow/{borrow_id}", response_model=Borrowing)
 def view_borrowing(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID
+    *, session: ReadSessionDep, user_lab: LabMembership, lab_id: uuid.UUID, item_id: uuid.UUID, borrow_id: uuid.UUID
 ) -> Any:
     """
     View details of a specific borrowing.
@@ -172,12 +177,6 @@ def view_borrowing(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     # Check if the user is a member of the lab
-    user_lab = session.exec(
-        select(UserLab).where(
-            UserLab.lab_id == lab_id,
-            UserLab.user_id == current_user.user_id
-        )
-    ).first()
     if not user_lab:
         raise HTTPException(status_code=400, detail="User is not a member of the lab")
 
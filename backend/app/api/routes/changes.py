@@ -0,0 +1,152 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import tuple_
+from sqlmodel import Session, col, func, select
+
+from app.api.deps import CurrentUser, LabMembership, SessionDep
+from app.api.pagination import decode_cursor, encode_cursor
+from app.models import (
+    Borrowing,
+    ChangeLog,
+    ChangeLogHorizon,
+    Item,
+    Lab,
+    LabChangesPublic,
+    UserLab,
+)
+
+router = APIRouter()
+
+
+# Change log entity names with the table model and id column of each
+ENTITIES: dict[str, tuple[Any, Any]] = {
+    "item": (Item, Item.item_id),
+    "borrowing": (Borrowing, Borrowing.borrow_id),
+    "user_lab": (UserLab, UserLab.userlab_id),
+}
+
+
+def read_lab_rows(
+    session: Session, lab_id: uuid.UUID, ids: dict[str, set[uuid.UUID]] | None = None
+) -> dict[str, list[Any]]:
+    """
+    Current items, borrowings and memberships of a lab by entity name, all of
+    them or only those with the given ids.
+    """
+    rows: dict[str, list[Any]] = {}
+    for entity, (model, id_column) in ENTITIES.items():
+        if model is Borrowing:
+            statement = select(Borrowing).join(Item).where(Item.lab_id == lab_id)
+        else:
+            statement = select(model).where(model.lab_id == lab_id)
+        if ids is not None:
+            if not ids[entity]:
+                rows[entity] = []
+                continue
+            statement = statement.where(id_column.in_(ids[entity]))
+        rows[entity] = list(session.exec(statement).all())
+    return rows
+
+
+@router.get("/{lab_id}/changes", response_model=LabChangesPublic)
+def read_lab_changes(
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_lab: LabMembership,
+    lab_id: uuid.UUID,
+    since: str | None = None,
+    limit: int = Query(default=500, ge=1, le=5000),
+) -> Any:
+    """
+    Items, borrowings and memberships of a lab changed since a sync token.
+
+    Without `since` the whole lab is returned. Pass the returned `next_token`
+    as `since` on the next sync; while `has_more` is set, more changes are
+    waiting. A token older than the compacted part of the change log gets a
+    410, and the client has to sync the whole lab again.
+    """
+    lab = session.get(Lab, lab_id)
+    if not lab:
+        raise HTTPException(status_code=404, detail="Lab not found")
+
+    if not current_user.is_superuser and not user_lab:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    # Every transaction below this id has finished, so no change logged by one
+    # of them can still show up behind the token
+    xmin = session.exec(
+        select(func.txid_snapshot_xmin(func.txid_current_snapshot()))
+    ).one()
+
+    if since is None:
+        rows = read_lab_rows(session, lab_id)
+        return LabChangesPublic(
+            items=rows["item"],
+            borrowings=rows["borrowing"],
+            members=rows["user_lab"],
+            deleted_item_ids=[],
+            deleted_borrow_ids=[],
+            deleted_userlab_ids=[],
+            next_token=encode_cursor(xmin, 0),
+            has_more=False,
+        )
+
+    try:
+        since_tx_id, since_seq = (int(value) for value in decode_cursor(since, 2))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    horizon = session.get(ChangeLogHorizon, 1)
+    if horizon and since_tx_id < horizon.tx_id:
+        raise HTTPException(
+            status_code=410,
+            detail="Changes since this token were compacted, sync the whole lab again",
+        )
+
+    entries = session.exec(
+        select(ChangeLog)
+        .where(
+            ChangeLog.lab_id == lab_id,
+            tuple_(ChangeLog.tx_id, ChangeLog.seq) > tuple_(since_tx_id, since_seq),
+            ChangeLog.tx_id < xmin,
+        )
+        .order_by(col(ChangeLog.tx_id), col(ChangeLog.seq))
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the latest operation on each row matters
+    latest_ops = {(entry.entity, entry.entity_id): entry.op for entry in entries}
+    changed: dict[str, set[uuid.UUID]] = {entity: set() for entity in ENTITIES}
+    for (entity, entity_id), op in latest_ops.items():
+        if op != "DELETE":
+            changed[entity].add(entity_id)
+    rows = read_lab_rows(session, lab_id, ids=changed)
+
+    # Rows that are gone by now, or moved to another lab, count as deleted
+    deleted: dict[str, list[uuid.UUID]] = {entity: [] for entity in ENTITIES}
+    for entity, (_, id_column) in ENTITIES.items():
+        found = {getattr(row, id_column.key) for row in rows[entity]}
+        deleted[entity] = [
+            entity_id
+            for changed_entity, entity_id in latest_ops
+            if changed_entity == entity and entity_id not in found
+        ]
+
+    if has_more:
+        next_token = encode_cursor(entries[-1].tx_id, entries[-1].seq)
+    else:
+        next_token = encode_cursor(xmin, 0)
+
+    return LabChangesPublic(
+        items=rows["item"],
+        borrowings=rows["borrowing"],
+        members=rows["user_lab"],
+        deleted_item_ids=deleted["item"],
+        deleted_borrow_ids=deleted["borrowing"],
+        deleted_userlab_ids=deleted["user_lab"],
+        next_token=next_token,
+        has_more=has_more,
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import CurrentUser, LabMembership, SessionDep
+from app.core.notify import listener
+from app.models import Lab
+
+router = APIRouter()
+
+# Filled by the notify_item_event and notify_borrowing_event triggers
+LAB_EVENTS_CHANNEL = "lab_events"
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+# Sent when events may have been lost, clients should refetch what they show
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+
+class LabEventBroker:
+    """
+    Fans the lab events received by this worker out to the open streams of each lab.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: defaultdict[str, set[asyncio.Queue[str]]] = defaultdict(set)
+
+    def subscribe(self, lab_id: str) -> asyncio.Queue[str]:
+        queue: asyncio.Queue[str] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers[lab_id].add(queue)
+        return queue
+
+    def unsubscribe(self, lab_id: str, queue: asyncio.Queue[str]) -> None:
+        queues = self.subscribers.get(lab_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[lab_id]
+
+    def publish(self, payload: str | None) -> None:
+        if payload is None:
+            for queues in self.subscribers.values():
+                for queue in queues:
+                    self._put(queue, RESYNC_MESSAGE)
+            return
+
+        event = json.loads(payload)
+        message = f"event: {event['type']}\ndata: {payload}\n\n"
+        for queue in self.subscribers.get(event["lab_id"], ()):
+            self._put(queue, message)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue[str], message: str) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client: drop its backlog and let it refetch instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC_MESSAGE)
+
+
+broker = LabEventBroker()
+listener.add_handler(LAB_EVENTS_CHANNEL, broker.publish)
+
+
+async def stream_lab_events(lab_id: str) -> AsyncIterator[str]:
+    queue = broker.subscribe(lab_id)
+    try:
+        yield f"retry: {KEEPALIVE_SECONDS * 1000}\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(lab_id, queue)
+
+
+@router.get("/{lab_id}/events")
+def read_lab_events(
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_lab: LabMembership,
+    lab_id: uuid.UUID,
+) -> Any:
+    """
+    Stream item and borrowing changes of a lab as Server-Sent Events.
+
+    Each event carries the changed row's ids and availability fields. A
+    `resync` event means some changes were missed and the lab's items should
+    be fetched again.
+    """
+    lab = session.get(Lab, lab_id)
+    if not lab:
+        raise HTTPException(status_code=404, detail="Lab not found")
+
+    if not current_user.is_superuser and not user_lab:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    # The stream can stay open for hours, don't hold a pooled connection for it
+    session.close()
+
+    return StreamingResponse(
+        stream_lab_events(str(lab_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
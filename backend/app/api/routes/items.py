@@ -1,29 +1,103 @@
+import json
+import math
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import func, select
+from fastapi import APIRouter, HTTPException, Depends, Request
+from sqlmodel import col, or_, select
 
-from app.api.deps import CurrentUser, SessionDep
+from app import crud
+from app.api.counting import CountStrategy, count_rows
+from app.api.deps import CurrentUser, LabMembership, ReadSessionDep, SessionDep
+from app.api.fields import (
+    FieldsQuery,
+    field_columns,
+    parse_fields,
+    row_mappings,
+    sparse_response,
+)
+from app.api.idempotency import (
+    IdempotencyKeyHeader,
+    begin_idempotent_request,
+    complete_idempotent_request,
+    request_hash,
+)
+from app.core.cache import TTLCache
 from app.models import (Item, 
                         ItemCreate, 
+                        ItemFacets,
                         ItemPublic, 
                         ItemsPublic, 
                         ItemUpdate, 
                         Message,
-                        Lab,
-                        UserLab)
+                        Lab)
 
 router = APIRouter()
 
+PARAM_FILTER_PREFIX = "param."
+
+# Facet counts per (lab, parameter filters), valid while the lab's items_version is unchanged
+item_facets_cache: TTLCache[
+    tuple[uuid.UUID, tuple[tuple[str, str], ...]], tuple[int, ItemFacets]
+] = TTLCache(maxsize=1024)
+
+
+def item_param_items(request: Request) -> tuple[tuple[str, str], ...]:
+    """
+    Collect the `?param.<name>=<value>` query parameters as sorted (name, value) pairs.
+    """
+    return tuple(sorted(
+        (key[len(PARAM_FILTER_PREFIX):], value)
+        for key, value in request.query_params.multi_items()
+        if key.startswith(PARAM_FILTER_PREFIX)
+    ))
+
+
+def item_param_filters(param_items: tuple[tuple[str, str], ...]) -> list[Any]:
+    """
+    Build JSONB containment filters from `?param.<name>=<value>` query parameters.
+
+    A value that parses as a JSON number or boolean also matches the typed value,
+    so `?param.pins=8` finds both {"pins": 8} and {"pins": "8"}.
+    """
+    filters = []
+    for name, value in param_items:
+        if not name:
+            raise HTTPException(status_code=400, detail="Invalid parameter filter")
+        candidates: list[Any] = [value]
+        try:
+            typed_value = json.loads(value)
+        except ValueError:
+            typed_value = None
+        if isinstance(typed_value, int | float) and math.isfinite(typed_value):
+            candidates.append(typed_value)
+        filters.append(
+            or_(
+                *[
+                    col(Item.item_params).contains({name: candidate})
+                    for candidate in candidates
+                ]
+            )
+        )
+    return filters
+
 
 @router.get("/{lab_id}/items", response_model=ItemsPublic)
 def read_items(
-    lab_id: uuid.UUID, session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    request: Request, lab_id: uuid.UUID, session: ReadSessionDep, current_user: CurrentUser, user_lab: LabMembership, skip: int = 0, limit: int = 100, facets: bool = False, count: CountStrategy = "exact", fields: FieldsQuery = None
 ) -> Any:
     """
     Retrieve items for a specific lab.
+
+    Items can be filtered by their parameters with `?param.<name>=<value>`.
+    With `facets=true` the response also carries vendor, parameter value and
+    availability counts over the filtered items.
+    `count` picks how the total is computed, `cached` reuses it until the
+    lab's items change.
+    `fields`, e.g. `item_name,quantity`, limits the fields returned for each
+    item, `item_id` is always included.
     """
+    names = parse_fields(fields, ItemPublic, "item_id")
 
     # Check if the current user is the owner of the lab or has can_edit_items permission
     lab = session.get(Lab, lab_id)
@@ -31,28 +105,50 @@ def read_items(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_items:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
-    # Retrieve all items for the lab
-    count_statement = select(func.count()).select_from(Item).where(Item.lab_id == lab_id)
-    count = session.exec(count_statement).one()
-    statement = select(Item).where(Item.lab_id == lab_id).offset(skip).limit(limit)
-    items = session.exec(statement).all()
+    # Retrieve all items for the lab matching the parameter filters
+    param_items = item_param_items(request)
+    param_filters = item_param_filters(param_items)
+    filters = [Item.lab_id == lab_id, *param_filters]
+    total = count_rows(
+        session=session,
+        strategy=count,
+        statement=select(Item.item_id).where(*filters),
+        cache_key=("items", lab_id, param_items),
+        version=lambda: lab.items_version,
+    )
+    item_facets = None
+    if facets:
+        cache_key = (lab_id, param_items)
+        cached = item_facets_cache.get(cache_key)
+        if cached and cached[0] == lab.items_version:
+            item_facets = cached[1]
+        else:
+            item_facets = crud.get_item_facets(session=session, lab_id=lab_id, filters=param_filters)
+            item_facets_cache.set(cache_key, (lab.items_version, item_facets))
 
-    return ItemsPublic(data=items, count=count)
+    if names is not None:
+        columns = field_columns(Item, names)
+        rows = session.exec(select(*columns).where(*filters).offset(skip).limit(limit)).all()
+        return sparse_response(
+            ItemsPublic,
+            ItemPublic,
+            names,
+            data=row_mappings(rows, columns),
+            count=total,
+            facets=item_facets,
+        )
+
+    statement = select(Item).where(*filters).offset(skip).limit(limit)
+    items = session.exec(statement).all()
+    return ItemsPublic(data=items, count=total, facets=item_facets)
 
 
 @router.get("/{lab_id}/items/{item_id}", response_model=ItemPublic)
 def read_item(
-    lab_id: uuid.UUID, session: SessionDep, current_user: CurrentUser, item_id: uuid.UUID
+    lab_id: uuid.UUID, session: ReadSessionDep, user_lab: LabMembership, item_id: uuid.UUID
 ) -> Any:
     """
     Get item by ID for a specific lab.
@@ -62,13 +158,6 @@ def read_item(
         raise HTTPException(status_code=404, detail="Item not found")
     
     # Check if the current user is associated with the lab
-    user_lab = session.exec(
-        select(UserLab).where(
-            UserLab.lab_id == lab_id,
-            UserLab.user_id == current_user.user_id
-        )
-    ).first()
-    
     if not user_lab:
         raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -77,32 +166,47 @@ def read_item(
 
 @router.post("/{lab_id}/items", response_model=ItemPublic)
 def create_item(
-    lab_id: uuid.UUID, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+    request: Request,
+    lab_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_lab: LabMembership,
+    item_in: ItemCreate,
+    idempotency_key: IdempotencyKeyHeader = None,
 ) -> Any:
     """
     Create new item for a specific lab.
+
+    A retry sent with the same `Idempotency-Key` header gets the response of the
+    first request instead of creating another item.
     """
+    replay = begin_idempotent_request(
+        session=session,
+        user_id=current_user.user_id,
+        key=idempotency_key,
+        fingerprint=request_hash("POST", request.url.path, item_in),
+    )
+    if replay:
+        return replay
+
     # Check if the current user is the owner of the lab or has can_edit_items permission
     lab = session.get(Lab, lab_id)
     if not lab:
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_items:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
     item = Item.model_validate(item_in, update={"owner_id": current_user.user_id, "lab_id": lab_id})
     session.add(item)
+    session.flush()
+    item_public = ItemPublic.model_validate(item)
+    complete_idempotent_request(
+        session=session, user_id=current_user.user_id, key=idempotency_key, response=item_public
+    )
     session.commit()
-    session.refresh(item)
-    return item
+    return item_public
 
 
 @router.put("/{lab_id}/items/{item_id}", response_model=ItemPublic)
@@ -110,6 +214,7 @@ def update_item(
     lab_id: uuid.UUID,
     session: SessionDep,
     current_user: CurrentUser,
+    user_lab: LabMembership,
     item_id: uuid.UUID,
     item_in: ItemUpdate,
 ) -> Any:
@@ -122,13 +227,6 @@ def update_item(
     
     # Check if the current user is the owner of the lab or has can_edit_items permission
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_items:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -142,7 +240,7 @@ def update_item(
 
 @router.delete("/{lab_id}/items/{item_id}")
 def delete_item(
-    lab_id: uuid.UUID, session: SessionDep, current_user: CurrentUser, item_id: uuid.UUID
+    lab_id: uuid.UUID, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, item_id: uuid.UUID
 ) -> Message:
     """
     Delete an item for a specific lab.
@@ -153,13 +251,6 @@ def delete_item(
     
     # Check if the current user is the owner of the lab or has can_edit_items permission
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_items:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -2,10 +2,14 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import and_, col, select
 
-from app.api.deps import CurrentUser, SessionDep
+from app import crud
+from app.api.counting import CountStrategy, count_rows
+from app.api.deps import CurrentUser, LabMembership, ReadSessionDep, SessionDep
+from app.api.fields import FieldsQuery, field_columns, parse_fields, sparse_response
 from app.models import (Lab, LabCreate, LabPublic, LabsPublic, LabUpdate, 
+                        LabStats, LabStatsPublic, LabsStatsPublic, LabWithPermissionsPublic,
                         UserLab, AddUsersToLab, RemoveUsersFromLab, UpdateUserLab,
                         User,
                         Message)
@@ -15,37 +19,147 @@ router = APIRouter()
 
 @router.get("/", response_model=LabsPublic)
 def read_labs(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: ReadSessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100, count: CountStrategy = "exact", fields: FieldsQuery = None
 ) -> Any:
     """
     Retrieve labs.
+
+    Regular users get the labs they own or are a member of, each with their
+    membership permissions attached. Superusers get every lab.
+    `count` picks how the total is computed.
+    `fields`, e.g. `lab_num,can_edit_items`, limits the fields returned for
+    each lab, `lab_id` is always included.
     """
+    names = parse_fields(fields, LabWithPermissionsPublic, "lab_id")
+    # owner_id is always read, is_owner depends on it
+    columns = field_columns(Lab, (*names, "owner_id")) if names is not None else []
 
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Lab)
-        count = session.exec(count_statement).one()
-        statement = select(Lab).offset(skip).limit(limit)
+        total = count_rows(
+            session=session,
+            strategy=count,
+            statement=select(Lab.lab_id),
+            cache_key=("labs",),
+            version=lambda: crud.get_table_version(session=session, table_names=["lab"]),
+            table_name="lab",
+        )
+        if names is not None:
+            statement = (
+                select(*columns).order_by(col(Lab.lab_id)).offset(skip).limit(limit)
+            )
+            rows = [
+                {
+                    **row._mapping,
+                    "is_owner": row.owner_id == current_user.user_id,
+                    "can_edit_lab": True,
+                    "can_edit_items": True,
+                    "can_edit_users": True,
+                }
+                for row in session.exec(statement).all()
+            ]
+            return sparse_response(
+                LabsPublic, LabWithPermissionsPublic, names, data=rows, count=total
+            )
+        statement = select(Lab).order_by(col(Lab.lab_id)).offset(skip).limit(limit)
         labs = session.exec(statement).all()
+        data = [
+            LabWithPermissionsPublic.model_validate(
+                lab,
+                update={
+                    "is_owner": lab.owner_id == current_user.user_id,
+                    "can_edit_lab": True,
+                    "can_edit_items": True,
+                    "can_edit_users": True,
+                },
+            )
+            for lab in labs
+        ]
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Lab)
-            .where(Lab.owner_id == current_user.user_id)
+        lab_ids = crud.accessible_lab_ids(user_id=current_user.user_id)
+        total = count_rows(
+            session=session,
+            strategy=count,
+            statement=select(Lab.lab_id).where(col(Lab.lab_id).in_(lab_ids)),
+            cache_key=("labs", current_user.user_id),
+            version=lambda: crud.get_table_version(
+                session=session, table_names=["lab", "user_lab"]
+            ),
         )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Lab)
-            .where(Lab.owner_id == current_user.user_id)
+        if names is not None:
+            statement = (
+                select(  # type: ignore[call-overload]
+                    *columns,
+                    UserLab.can_edit_lab,
+                    UserLab.can_edit_items,
+                    UserLab.can_edit_users,
+                )
+                .outerjoin(
+                    UserLab,
+                    and_(UserLab.lab_id == Lab.lab_id, UserLab.user_id == current_user.user_id),
+                )
+                .where(col(Lab.lab_id).in_(lab_ids))
+                .order_by(col(Lab.lab_id))
+                .offset(skip)
+                .limit(limit)
+            )
+            rows = [
+                {
+                    **row._mapping,
+                    "is_owner": row.owner_id == current_user.user_id,
+                    "can_edit_lab": bool(row.can_edit_lab),
+                    "can_edit_items": bool(row.can_edit_items),
+                    "can_edit_users": bool(row.can_edit_users),
+                }
+                for row in session.exec(statement).all()
+            ]
+            return sparse_response(
+                LabsPublic, LabWithPermissionsPublic, names, data=rows, count=total
+            )
+        member_statement = (
+            select(Lab, UserLab)
+            .outerjoin(
+                UserLab,
+                and_(UserLab.lab_id == Lab.lab_id, UserLab.user_id == current_user.user_id),
+            )
+            .where(col(Lab.lab_id).in_(lab_ids))
+            .order_by(col(Lab.lab_id))
             .offset(skip)
             .limit(limit)
         )
-        labs = session.exec(statement).all()
+        data = [
+            LabWithPermissionsPublic.model_validate(
+                lab,
+                update={
+                    "is_owner": lab.owner_id == current_user.user_id,
+                    "can_edit_lab": bool(user_lab and user_lab.can_edit_lab),
+                    "can_edit_items": bool(user_lab and user_lab.can_edit_items),
+                    "can_edit_users": bool(user_lab and user_lab.can_edit_users),
+                },
+            )
+            for lab, user_lab in session.exec(member_statement).all()
+        ]
 
-    return LabsPublic(data=labs, count=count)
+    return LabsPublic(data=data, count=total)
+
+
+@router.get("/stats", response_model=LabsStatsPublic)
+def read_labs_stats(session: ReadSessionDep, current_user: CurrentUser) -> Any:
+    """
+    Retrieve item, quantity, active borrow and member counts for the labs the
+    current user owns or is a member of.
+    """
+    statement = select(LabStats).where(
+        col(LabStats.lab_id).in_(crud.accessible_lab_ids(user_id=current_user.user_id))
+    )
+    stats = session.exec(statement).all()
+    return LabsStatsPublic(
+        data=[LabStatsPublic.model_validate(lab_stats) for lab_stats in stats],
+        count=len(stats),
+    )
 
 
 @router.get("/{lab_id}", response_model=LabPublic)
-def read_lab(session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID) -> Any:
+def read_lab(session: ReadSessionDep, current_user: CurrentUser, lab_id: uuid.UUID) -> Any:
     """
     Get lab by ID.
     """
@@ -76,6 +190,7 @@ def update_lab(
     *,
     session: SessionDep,
     current_user: CurrentUser,
+    user_lab: LabMembership,
     lab_id: uuid.UUID,
     lab_in: LabUpdate,
 ) -> Any:
@@ -87,13 +202,6 @@ def update_lab(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_lab:
             raise HTTPException(status_code=400, detail="Not enough permissions")
     update_dict = lab_in.model_dump(exclude_unset=True)
@@ -106,7 +214,7 @@ def update_lab(
 
 @router.delete("/{lab_id}")
 def delete_lab(
-    session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID
+    session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID
 ) -> Message:
     """
     Delete a lab.
@@ -116,13 +224,6 @@ def delete_lab(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_lab:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -132,7 +233,7 @@ def delete_lab(
 
 @router.post("/{lab_id}/add-users", response_model=Message)
 def add_users_to_lab(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, add_users_in: AddUsersToLab
+    *, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID, add_users_in: AddUsersToLab
 ) -> Any:
     """
     Add users to a lab by providing a list of emails and their permissions.
@@ -143,13 +244,6 @@ def add_users_to_lab(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_users:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -166,22 +260,22 @@ def add_users_to_lab(
     # Create UserLab instances for each user and the lab with specified permissions
     user_labs = []
     for user in users:
-        user_lab = UserLab(
+        member = UserLab(
             user_id=user.user_id,
             lab_id=lab_id,
             can_edit_lab=add_users_in.can_edit_lab,
             can_edit_items=add_users_in.can_edit_items,
             can_edit_users=add_users_in.can_edit_users
         )
-        session.add(user_lab)
-        user_labs.append(user_lab)
+        session.add(member)
+        user_labs.append(member)
 
     session.commit()
     return Message(message="Users added to lab successfully with specified permissions")
 
 @router.delete("/{lab_id}/remove-user", response_model=Message)
 def remove_users_from_lab(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, remove_user_in: RemoveUsersFromLab
+    *, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID, remove_user_in: RemoveUsersFromLab
 ) -> Any:
     """
     Remove users from a lab by providing a list of emails.
@@ -192,13 +286,6 @@ def remove_users_from_lab(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_users:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -224,15 +311,15 @@ def remove_users_from_lab(
         raise HTTPException(status_code=404, detail="No matching UserLab instances found")
 
     # Delete UserLab instances
-    for user_lab in user_labs_to_delete:
-        session.delete(user_lab)
+    for member in user_labs_to_delete:
+        session.delete(member)
 
     session.commit()
     return Message(message="Users removed from lab successfully")
 
 @router.put("/{lab_id}/update-user-permissions", response_model=Message)
 def update_user_permissions(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID, update_permissions_in: UpdateUserLab
+    *, session: SessionDep, current_user: CurrentUser, user_lab: LabMembership, lab_id: uuid.UUID, update_permissions_in: UpdateUserLab
 ) -> Any:
     """
     Update user permissions in a lab by providing a list of emails and their new permissions.
@@ -243,13 +330,6 @@ def update_user_permissions(
         raise HTTPException(status_code=404, detail="Lab not found")
     
     if not current_user.is_superuser:
-        user_lab = session.exec(
-            select(UserLab).where(
-                UserLab.lab_id == lab_id,
-                UserLab.user_id == current_user.user_id
-            )
-        ).first()
-        
         if not user_lab or not user_lab.can_edit_users:
             raise HTTPException(status_code=400, detail="Not enough permissions")
 
@@ -265,27 +345,27 @@ def update_user_permissions(
 
     # Update UserLab instances for each user and the lab with new permissions
     for user in users:
-        user_lab = session.exec(
+        member = session.exec(
             select(UserLab).where(
                 UserLab.lab_id == lab_id,
                 UserLab.user_id == user.user_id
             )
         ).first()
         
-        if not user_lab:
+        if not member:
             raise HTTPException(status_code=404, detail=f"User with email {user.email} is not associated with this lab")
         
-        user_lab.can_edit_lab = update_permissions_in.can_edit_lab
-        user_lab.can_edit_items = update_permissions_in.can_edit_items
-        user_lab.can_edit_users = update_permissions_in.can_edit_users
-        session.add(user_lab)
+        member.can_edit_lab = update_permissions_in.can_edit_lab
+        member.can_edit_items = update_permissions_in.can_edit_items
+        member.can_edit_users = update_permissions_in.can_edit_users
+        session.add(member)
 
     session.commit()
     return Message(message="User permissions updated successfully")
 
 @router.get("/{lab_id}/users", response_model=list[User])
 def view_lab_users(
-    *, session: SessionDep, current_user: CurrentUser, lab_id: uuid.UUID
+    *, session: ReadSessionDep, current_user: CurrentUser, lab_id: uuid.UUID
 ) -> Any:
     """
     View all users in a specific lab with their permissions.
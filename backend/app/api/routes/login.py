@@ -1,16 +1,31 @@
 from datetime import timedelta
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlmodel import Session
 
 from app import crud
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app.api.deps import (
+    CurrentUser,
+    SessionDep,
+    get_current_active_superuser,
+    get_user_by_email_cached,
+)
 from app.core import security
 from app.core.config import settings
+from app.core.invalidation import USERS_CACHE, bus
 from app.core.security import get_password_hash
-from app.models import Message, NewPassword, Token, UserPublic
+from app.core.throttle import login_throttle
+from app.models import (
+    Message,
+    NewPassword,
+    RefreshTokenRequest,
+    Token,
+    User,
+    UserPublic,
+)
 from app.utils import (
     generate_password_reset_token,
     generate_reset_password_email,
@@ -21,13 +36,47 @@ from app.utils import (
 router = APIRouter()
 
 
+def create_token(session: Session, user: User, refresh_token: str) -> Token:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    lab_permissions = crud.get_lab_permission_masks(
+        session=session, user_id=user.user_id, max_labs=settings.ACCESS_TOKEN_MAX_LABS
+    )
+    return Token(
+        access_token=security.create_access_token(
+            user.user_id,
+            expires_delta=access_token_expires,
+            lab_permissions=lab_permissions,
+            permissions_version=user.permissions_version,
+        ),
+        refresh_token=refresh_token,
+    )
+
+
+def check_login_throttle(request: Request, action: str, account: str) -> None:
+    """
+    Turn away attempts over the per address or per account limits, before
+    any password hashing.
+    """
+    ip = request.client.host if request.client else ""
+    retry_after = login_throttle.check(action, ip, account)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 @router.post("/login/access-token")
 def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    session: SessionDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
+    check_login_throttle(request, "login", form_data.username)
     user = crud.authenticate(
         session=session, email=form_data.username, password=form_data.password
     )
@@ -35,12 +84,33 @@ def login_access_token(
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return Token(
-        access_token=security.create_access_token(
-            user.user_id, expires_delta=access_token_expires
-        )
+    refresh_token = crud.create_refresh_token(
+        session=session,
+        user_id=user.user_id,
+        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
     )
+    return create_token(session, user, refresh_token)
+
+
+@router.post("/login/refresh-token")
+def refresh_access_token(session: SessionDep, body: RefreshTokenRequest) -> Token:
+    """
+    Get a new access token with a refresh token, without the password.
+
+    Refresh tokens are single use: the response carries the refresh token to
+    use next time.
+    """
+    rotated = crud.rotate_refresh_token(
+        session=session,
+        token=body.refresh_token,
+        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    if not rotated:
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
+    user, refresh_token = rotated
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return create_token(session, user, refresh_token)
 
 
 @router.post("/login/test-token", response_model=UserPublic)
@@ -52,11 +122,12 @@ def test_token(current_user: CurrentUser) -> Any:
 
 
 @router.post("/password-recovery/{email}")
-def recover_password(email: str, session: SessionDep) -> Message:
+def recover_password(request: Request, email: str, session: SessionDep) -> Message:
     """
     Password Recovery
     """
-    user = crud.get_user_by_email(session=session, email=email)
+    check_login_throttle(request, "recovery", email)
+    user = get_user_by_email_cached(session, email)
 
     if not user:
         raise HTTPException(
@@ -94,6 +165,8 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
     hashed_password = get_password_hash(password=body.new_password)
     user.hashed_password = hashed_password
     session.add(user)
+    crud.revoke_refresh_tokens(session=session, user_id=user.user_id)
+    bus.publish(session=session, name=USERS_CACHE, key=str(user.user_id))
     session.commit()
     return Message(message="Password updated successfully")
 
@@ -0,0 +1,124 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import Text
+from sqlmodel import Session, and_, cast, col, func, or_, select
+
+from app import crud
+from app.api.deps import CurrentUser, ReadSessionDep
+from app.api.pagination import decode_cursor, encode_cursor
+from app.models import Item, ItemPublic, ItemsSearchPublic, User
+
+router = APIRouter()
+
+
+def search_items(
+    *,
+    session: Session,
+    current_user: User,
+    q: str,
+    lab_id: uuid.UUID | None,
+    cursor: str | None,
+    limit: int,
+) -> ItemsSearchPublic:
+    """
+    Rank items by trigram similarity of their name, vendor and params to `q`.
+
+    Both the substring (ILIKE) and the fuzzy (%) match are served by the
+    pg_trgm GIN indexes on `item`. Membership is applied in the same query.
+    """
+    pattern = (
+        "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    )
+    params = cast(Item.item_params, Text)
+    rank = func.greatest(
+        func.similarity(Item.item_name, q),
+        func.similarity(Item.item_vendor, q),
+        func.similarity(params, q),
+    ).label("rank")
+
+    statement = select(Item, rank).where(
+        or_(
+            col(Item.item_name).ilike(pattern),
+            col(Item.item_vendor).ilike(pattern),
+            params.ilike(pattern),
+            col(Item.item_name).op("%")(q),
+            col(Item.item_vendor).op("%")(q),
+        )
+    )
+    if lab_id is not None:
+        statement = statement.where(Item.lab_id == lab_id)
+    if not current_user.is_superuser:
+        statement = statement.where(
+            col(Item.lab_id).in_(crud.accessible_lab_ids(user_id=current_user.user_id))
+        )
+    if cursor:
+        last_rank, last_item_id = decode_cursor(cursor, 2)
+        try:
+            last_rank_value = float(last_rank)
+            last_item_uuid = uuid.UUID(last_item_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(
+            or_(
+                rank < last_rank_value,
+                and_(rank == last_rank_value, Item.item_id > last_item_uuid),
+            )
+        )
+    statement = statement.order_by(rank.desc(), col(Item.item_id)).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_item, last_rank_value = rows[-1]
+        next_cursor = encode_cursor(last_rank_value, last_item.item_id)
+
+    return ItemsSearchPublic(
+        data=[ItemPublic.model_validate(item) for item, _ in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/labs/{lab_id}/items/search", response_model=ItemsSearchPublic)
+def search_lab_items(
+    lab_id: uuid.UUID,
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=255),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    Search items of a lab by name, vendor or params.
+    """
+    return search_items(
+        session=session,
+        current_user=current_user,
+        q=q,
+        lab_id=lab_id,
+        cursor=cursor,
+        limit=limit,
+    )
+
+
+@router.get("/items/search", response_model=ItemsSearchPublic)
+def search_all_items(
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=255),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    Search items across all labs the current user owns or is a member of.
+    """
+    return search_items(
+        session=session,
+        current_user=current_user,
+        q=q,
+        lab_id=None,
+        cursor=cursor,
+        limit=limit,
+    )
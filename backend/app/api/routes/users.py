@@ -1,16 +1,29 @@
 import uuid
-from typing import Any
+from datetime import datetime
+from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import tuple_
 from sqlmodel import col, delete, func, select
 
 from app import crud
+from app.api.counting import CountStrategy, count_rows
 from app.api.deps import (
     CurrentUser,
+    ReadSessionDep,
     SessionDep,
     get_current_active_superuser,
 )
+from app.api.fields import (
+    FieldsQuery,
+    field_columns,
+    parse_fields,
+    row_mappings,
+    sparse_response,
+)
+from app.api.pagination import decode_cursor, encode_cursor
 from app.core.config import settings
+from app.core.invalidation import USERS_CACHE, bus
 from app.core.security import get_password_hash, verify_password
 from app.models import (
     Item,
@@ -24,6 +37,11 @@ from app.models import (
     UserUpdate,
     UserUpdateMe,
     Borrowing,
+    Lab,
+    MyBorrowingPublic,
+    MyBorrowingsPublic,
+    MyLabPublic,
+    MyLabsPublic,
     UserLab
 )
 from app.utils import generate_new_account_email, send_email
@@ -36,18 +54,42 @@ router = APIRouter()
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: ReadSessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    count: CountStrategy = "exact",
+    fields: FieldsQuery = None,
+) -> Any:
     """
     Retrieve users.
-    """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    `count` picks how the total is computed.
+    `fields`, e.g. `email,full_name`, limits the fields returned for each
+    user, `user_id` is always included.
+    """
+    names = parse_fields(fields, UserPublic, "user_id")
+
+    total = count_rows(
+        session=session,
+        strategy=count,
+        statement=select(User.user_id),
+        cache_key=("users",),
+        version=lambda: crud.get_table_version(session=session, table_names=["user"]),
+        table_name="user",
+    )
+
+    if names is not None:
+        columns = field_columns(User, names)
+        rows = session.exec(select(*columns).offset(skip).limit(limit)).all()
+        return sparse_response(
+            UsersPublic, UserPublic, names, data=row_mappings(rows, columns), count=total
+        )
 
     statement = select(User).offset(skip).limit(limit)
     users = session.exec(statement).all()
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=total)
 
 
 @router.post(
@@ -94,6 +136,9 @@ def update_user_me(
     user_data = user_in.model_dump(exclude_unset=True)
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
+    bus.publish(session=session, name=USERS_CACHE, key=str(current_user.user_id))
+    if "email" in user_data:
+        crud.publish_user_email(session=session, email=current_user.email)
     session.commit()
     session.refresh(current_user)
     return current_user
@@ -115,6 +160,8 @@ def update_password_me(
     hashed_password = get_password_hash(body.new_password)
     current_user.hashed_password = hashed_password
     session.add(current_user)
+    crud.revoke_refresh_tokens(session=session, user_id=current_user.user_id)
+    bus.publish(session=session, name=USERS_CACHE, key=str(current_user.user_id))
     session.commit()
     return Message(message="Password updated successfully")
 
@@ -139,6 +186,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
     statement = delete(Item).where(col(Item.owner_id) == current_user.user_id)
     session.exec(statement)  # type: ignore
     session.delete(current_user)
+    bus.publish(session=session, name=USERS_CACHE, key=str(current_user.user_id))
     session.commit()
     return Message(message="User deleted successfully")
 
@@ -226,37 +274,118 @@ def delete_user(
     statement = delete(Item).where(col(Item.owner_id) == user_id)
     session.exec(statement)  # type: ignore
     session.delete(user)
+    bus.publish(session=session, name=USERS_CACHE, key=str(user.user_id))
     session.commit()
     return Message(message="User deleted successfully")
 
-@router.get("/users/me/borrows", response_model=list[Borrowing])
+@router.get("/me/borrows", response_model=MyBorrowingsPublic)
 def view_my_borrowings(
-    *, session: SessionDep, current_user: CurrentUser
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    status: Literal["active", "returned"] | None = None,
+    borrowed_from: datetime | None = None,
+    borrowed_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
 ) -> Any:
     """
-    View all borrowings for the current user.
+    View the current user's borrowings, newest first, with their item and lab.
+
+    Borrowings are active while they have no return date. Pages are chained
+    with the returned `next_cursor`.
     """
-    # Get all borrowings for the current user
-    borrowings = session.exec(
-        select(Borrowing).where(
-            Borrowing.user_id == current_user.user_id
+    borrowed_at = func.coalesce(Borrowing.borrowed_at, "")
+    statement = (
+        select(  # type: ignore[call-overload, misc]
+            Borrowing.borrow_id,
+            Borrowing.item_id,
+            Borrowing.borrowed_at,
+            Borrowing.returned_at,
+            Item.item_name,
+            Lab.lab_id,
+            Lab.lab_place,
+            Lab.lab_university,
+            Lab.lab_num,
+        )
+        .join(Item, Item.item_id == Borrowing.item_id)
+        .join(Lab, Lab.lab_id == Item.lab_id)
+        .where(Borrowing.user_id == current_user.user_id)
+    )
+    if status == "active":
+        statement = statement.where(col(Borrowing.returned_at).is_(None))
+    elif status == "returned":
+        statement = statement.where(col(Borrowing.returned_at).is_not(None))
+    if borrowed_from:
+        statement = statement.where(col(Borrowing.borrowed_at) >= borrowed_from.isoformat())
+    if borrowed_to:
+        statement = statement.where(col(Borrowing.borrowed_at) < borrowed_to.isoformat())
+    if cursor:
+        last_borrowed_at, last_borrow_id = decode_cursor(cursor, 2)
+        try:
+            last_borrow_uuid = uuid.UUID(last_borrow_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(
+            tuple_(borrowed_at, Borrowing.borrow_id) < tuple_(last_borrowed_at, last_borrow_uuid)
         )
-    ).all()
+    statement = statement.order_by(borrowed_at.desc(), col(Borrowing.borrow_id).desc()).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.borrowed_at or "", last.borrow_id)
 
-    return borrowings
+    return MyBorrowingsPublic(
+        data=[MyBorrowingPublic.model_validate(dict(row._mapping)) for row in rows],
+        next_cursor=next_cursor,
+    )
 
-@router.get("/users/me/labs", response_model=list[UserLab])
+
+@router.get("/me/labs", response_model=MyLabsPublic)
 def view_my_labs(
-    *, session: SessionDep, current_user: CurrentUser
+    *,
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
 ) -> Any:
     """
-    View all labs for the current user.
+    View the labs the current user is a member of, with their permissions.
     """
-    # Get all labs for the current user
-    user_labs = session.exec(
-        select(UserLab).where(
-            UserLab.user_id == current_user.user_id
+    statement = (
+        select(  # type: ignore[call-overload]
+            UserLab.userlab_id,
+            UserLab.can_edit_lab,
+            UserLab.can_edit_items,
+            UserLab.can_edit_users,
+            Lab.lab_id,
+            Lab.owner_id,
+            Lab.lab_place,
+            Lab.lab_university,
+            Lab.lab_num,
         )
-    ).all()
-
-    return user_labs
+        .join(Lab, Lab.lab_id == UserLab.lab_id)
+        .where(UserLab.user_id == current_user.user_id)
+    )
+    if cursor:
+        (last_lab_id,) = decode_cursor(cursor, 1)
+        try:
+            last_lab_uuid = uuid.UUID(last_lab_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(UserLab.lab_id > last_lab_uuid)
+    statement = statement.order_by(UserLab.lab_id).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].lab_id)
+
+    return MyLabsPublic(
+        data=[MyLabPublic.model_validate(dict(row._mapping)) for row in rows],
+        next_cursor=next_cursor,
+    )
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.throttle import login_throttle
+from app.core.warmup import ready
 from app.models import Message
 from app.utils import generate_test_email, send_email
 
@@ -26,6 +28,28 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/login-throttle-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def login_throttle_stats() -> dict[str, int]:
+    """
+    Login and password recovery attempts this worker allowed and rejected,
+    since it started.
+    """
+    return login_throttle.stats()
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/ready/")
+async def readiness_check() -> bool:
+    """
+    Whether this worker has warmed up and should be sent traffic.
+    """
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return True
@@ -0,0 +1,21 @@
+import logging
+import sys
+from pathlib import Path
+
+from app.api.openapi import serialize_openapi
+from app.main import app
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    # Written with the same settings the app will run with, e.g. at deploy
+    # time, then served through OPENAPI_FILE
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else "openapi.json")
+    path.write_bytes(serialize_openapi(app.openapi()))
+    logger.info("OpenAPI schema written to %s", path)
+
+
+if __name__ == "__main__":
+    main()
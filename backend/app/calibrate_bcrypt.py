@@ -0,0 +1,64 @@
+import argparse
+import logging
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# bcrypt's own bounds, and the least cost worth using for passwords
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+RECOMMENDED_MIN_ROUNDS = 10
+
+
+def hash_seconds(rounds: int, runs: int) -> float:
+    """
+    Median time to hash a password at the given cost on this machine.
+    """
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        hasher.hash("calibration password")
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def calibrate(budget: float, runs: int) -> int:
+    """
+    The highest cost whose hashes take at most `budget` seconds, each round
+    doubles the time.
+    """
+    rounds = MIN_ROUNDS
+    while rounds < MAX_ROUNDS:
+        seconds = hash_seconds(rounds + 1, runs)
+        logger.info("%d rounds: %.1fms", rounds + 1, seconds * 1000)
+        if seconds > budget:
+            break
+        rounds += 1
+    return rounds
+
+
+def main() -> None:
+    # Run on the machine, or in the container, that will serve logins
+    parser = argparse.ArgumentParser(
+        description="Pick BCRYPT_ROUNDS for a password hashing time budget"
+    )
+    parser.add_argument("--budget-ms", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.budget_ms / 1000, args.runs)
+    if rounds < RECOMMENDED_MIN_ROUNDS:
+        logger.warning(
+            "Fewer than %d rounds makes hashes cheap to crack, consider a larger budget",
+            RECOMMENDED_MIN_ROUNDS,
+        )
+    logger.info("BCRYPT_ROUNDS=%d", rounds)
+
+
+if __name__ == "__main__":
+    main()
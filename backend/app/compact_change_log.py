@@ -0,0 +1,30 @@
+import logging
+from datetime import timedelta
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def compact() -> int:
+    with Session(engine) as session:
+        return crud.compact_change_log(
+            session=session,
+            retention=timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS),
+        )
+
+
+def main() -> None:
+    # Meant to run periodically, e.g. daily from cron
+    logger.info("Compacting change log")
+    deleted = compact()
+    logger.info("Change log compacted, %d entries deleted", deleted)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import hashlib
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import TTLCache
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional, "br" is only offered when it is installed
+    brotli = None
+
+# Content encodings responses can be compressed with, in order of preference
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "application/xml"}
+# Bodies larger than this are compressed in a worker thread
+THREAD_MINIMUM_SIZE = 128 * 1024
+# Larger compressed bodies aren't kept for reuse
+CACHE_MAX_BODY_SIZE = 1024 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """
+    The encoding to compress a response with for an Accept-Encoding header,
+    brotli first, or None to send it as is.
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip()] = quality
+    best = max(
+        ENCODINGS, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0))
+    )
+    if accepted.get(best, accepted.get("*", 0.0)) <= 0:
+        return None
+    return best
+
+
+def is_compressible(status: int, headers: Headers) -> bool:
+    if status in (204, 206, 304) or "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    # Event streams have to reach the client message by message
+    if media_type == "text/event-stream":
+        return False
+    return (
+        media_type in COMPRESSIBLE_TYPES
+        or media_type.startswith("text/")
+        or media_type.endswith("+json")
+    )
+
+
+class StreamCompressor:
+    """
+    Compresses a body chunk by chunk, flushing after each so every chunk can
+    be decoded as soon as it arrives.
+    """
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(
+                gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return bytes(self._brotli.process(data) + self._brotli.flush())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return bytes(self._brotli.finish())
+        return self._gzip.flush()
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return bytes(brotli.compress(body, quality=brotli_quality))
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least `minimum_size` bytes with brotli or gzip,
+    whichever the client prefers. Streamed responses are compressed as they
+    are sent.
+
+    Compressed bodies are kept by a digest of the uncompressed body, so a
+    response that hasn't changed since it was last sent, like a polled
+    listing with the same ETag, isn't compressed again.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 256,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache: TTLCache[tuple[str, bytes], bytes] = TTLCache(
+            maxsize=cache_size, ttl=300
+        )
+
+    async def compress_body(self, body: bytes, encoding: str) -> bytes:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            return compressed
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            compressed = await anyio.to_thread.run_sync(
+                compress, body, encoding, self.gzip_level, self.brotli_quality
+            )
+        else:
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+        if len(compressed) <= CACHE_MAX_BODY_SIZE:
+            self.cache.set(key, compressed)
+        return compressed
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        passthrough = False
+        compressor: StreamCompressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                if is_compressible(message["status"], Headers(raw=message["headers"])):
+                    # Held back until the first body part shows how large it is
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(raw=list(start["headers"]))
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    compressed = await self.compress_body(body, encoding)
+                    headers["Content-Length"] = str(len(compressed))
+                    await send({**start, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                compressor = StreamCompressor(
+                    encoding, self.gzip_level, self.brotli_quality
+                )
+                await send({**start, "headers": headers.raw})
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            await send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
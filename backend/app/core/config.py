@@ -34,6 +34,41 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Refresh tokens renew access tokens without the password, so access
+    # tokens can be given a much shorter lifetime
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Users in more labs than this get tokens without lab permission claims
+    ACCESS_TOKEN_MAX_LABS: int = 100
+    # Cost of new password hashes, picked with app/calibrate_bcrypt.py on the
+    # machine that serves logins. Hashes of another cost are redone on login
+    BCRYPT_ROUNDS: int = 12
+    # How long a user id or email found to have no user is remembered as such
+    MISSING_USER_CACHE_TTL_SECONDS: int = 30
+    # How long a stored response is replayed for a repeated Idempotency-Key
+    IDEMPOTENCY_KEY_EXPIRE_HOURS: int = 24
+    # Change log entries older than this are removed by app/compact_change_log.py
+    CHANGE_LOG_RETENTION_DAYS: int = 30
+    # OpenAPI schema written by app/build_openapi.py, served instead of
+    # generating the schema in every worker
+    OPENAPI_FILE: str | None = None
+    # Login and password recovery attempts allowed per client address and per
+    # account within the window, spread over it once used up
+    LOGIN_ATTEMPTS_PER_IP: int = 30
+    LOGIN_ATTEMPTS_PER_ACCOUNT: int = 10
+    LOGIN_THROTTLE_WINDOW_SECONDS: int = 600
+    # "memory" counts attempts in each worker, "postgres" shares them
+    LOGIN_THROTTLE_STORE: Literal["memory", "postgres"] = "memory"
+    # Cost of the requests one user can have in flight on a worker, most
+    # requests cost 1, see ROUTE_COSTS in app/core/limiter.py
+    USER_CONCURRENCY_LIMIT: int = 8
+    # Requests over the limit queue for up to this long, then get a 429
+    USER_QUEUE_SIZE: int = 32
+    USER_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    GZIP_COMPRESSION_LEVEL: int = 6
+    # Used when the optional brotli package is installed
+    BROTLI_QUALITY: int = 4
     FRONTEND_HOST: str = "http://localhost:5174"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -47,9 +82,6 @@ class Settings(BaseSettings):
         return [str(origin).rstrip("/") for origin in self.BACKEND_CORS_ORIGINS] + [
             self.FRONTEND_HOST
         ]
-    
-    print(all_cors_origins)
-    print(FRONTEND_HOST)
 
     PROJECT_NAME: str
     SENTRY_DSN: HttpUrl | None = None
@@ -58,16 +90,46 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Connections each worker keeps open to the primary, all opened at startup
+    DB_POOL_SIZE: int = 5
+    # Extra connections opened under load and closed once returned
+    DB_MAX_OVERFLOW: int = 10
 
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
+        return self.postgres_uri(self.POSTGRES_SERVER, self.POSTGRES_PORT)
+
+    # Optional read replicas as host or host:port, sharing the primary's
+    # credentials and database
+    POSTGRES_REPLICA_SERVERS: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = []
+    # Replicas further behind the primary than this are skipped
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    # How often the replicas' lag is checked
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+    # A user's reads go to the primary for this long after their own writes
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> list[PostgresDsn]:
+        uris = []
+        for server in self.POSTGRES_REPLICA_SERVERS:
+            host, _, port = server.partition(":")
+            uris.append(
+                self.postgres_uri(host, int(port) if port else self.POSTGRES_PORT)
+            )
+        return uris
+
+    def postgres_uri(self, host: str, port: int) -> PostgresDsn:
         return MultiHostUrl.build(
             scheme="postgresql+psycopg",
             username=self.POSTGRES_USER,
             password=self.POSTGRES_PASSWORD,
-            host=self.POSTGRES_SERVER,
-            port=self.POSTGRES_PORT,
+            host=host,
+            port=port,
             path=self.POSTGRES_DB,
         )
 
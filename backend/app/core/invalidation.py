@@ -0,0 +1,86 @@
+import json
+import threading
+from collections import defaultdict
+from typing import Any, TypeVar
+
+from sqlmodel import Session, func, select
+
+from app.core.cache import TTLCache
+from app.core.notify import NotificationListener, listener
+
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+# Names of the caches on the bus
+USERS_CACHE = "users"
+MISSING_USERS_CACHE = "missing_users"
+
+C = TypeVar("C", bound=TTLCache[str, Any])
+
+
+class InvalidationBus:
+    """
+    Keeps the named in-process caches of every worker in step with the database.
+
+    A write publishes the keys it makes stale with NOTIFY in its own
+    transaction, so every worker, including the writing one, evicts them once
+    the write commits. Caches on this bus use string keys.
+    """
+
+    def __init__(self) -> None:
+        self.caches: dict[str, TTLCache[str, Any]] = {}
+        # Bumped on every eviction, guards against filling a cache with a value
+        # read before a concurrent write committed
+        self.generations: defaultdict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def register(self, name: str, cache: C) -> C:
+        self.caches[name] = cache
+        return cache
+
+    def subscribe(self, listener: NotificationListener) -> None:
+        listener.add_handler(CACHE_INVALIDATION_CHANNEL, self.handle)
+
+    def generation(self, name: str) -> int:
+        return self.generations[name]
+
+    def set_if_current(self, name: str, key: str, value: Any, generation: int) -> None:
+        """
+        Cache a value loaded after `generation(name)` returned `generation`,
+        unless an eviction happened in the meantime.
+        """
+        with self._lock:
+            if self.generations[name] == generation:
+                self.caches[name].set(key, value)
+
+    def evict(self, name: str, key: str | None = None) -> None:
+        cache = self.caches.get(name)
+        if cache is None:
+            return
+        with self._lock:
+            self.generations[name] += 1
+            if key is None:
+                cache.clear()
+            else:
+                cache.pop(key)
+
+    def publish(self, *, session: Session, name: str, key: str | None = None) -> None:
+        """
+        Evict a key, or the whole cache, on all workers when the session's
+        transaction commits.
+        """
+        self.evict(name, key)
+        payload = json.dumps({"cache": name, "key": key})
+        session.exec(select(func.pg_notify(CACHE_INVALIDATION_CHANNEL, payload)))
+
+    def handle(self, payload: str | None) -> None:
+        if payload is None:
+            # Invalidations may have been missed while disconnected
+            for name in self.caches:
+                self.evict(name)
+            return
+        message = json.loads(payload)
+        self.evict(message["cache"], message["key"])
+
+
+bus = InvalidationBus()
+bus.subscribe(listener)
@@ -0,0 +1,182 @@
+import asyncio
+import math
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import security
+from app.core.config import settings
+
+
+@dataclass
+class RouteCost:
+    method: str
+    # Matched against the path below API_V1_STR
+    pattern: re.Pattern[str]
+    weight: int
+    # For listings, the weight counts once per this many rows of `?limit=`
+    rows_per_weight: int | None = None
+
+
+# Requests not listed here cost 1, event streams are never limited since
+# they stay open for as long as the client keeps them
+ROUTE_COSTS = [
+    RouteCost("GET", re.compile(r"/labs/[^/]+/events"), 0),
+    RouteCost("GET", re.compile(r"/labs/[^/]+/items"), 2, rows_per_weight=100),
+    RouteCost(
+        "GET", re.compile(r"(/labs/[^/]+)?/items/search"), 2, rows_per_weight=100
+    ),
+    RouteCost("GET", re.compile(r"/labs/[^/]+/changes"), 2, rows_per_weight=500),
+    RouteCost("GET", re.compile(r"/(labs|users)/?"), 1, rows_per_weight=100),
+    RouteCost("POST", re.compile(r"/labs/[^/]+/batch"), 4),
+    RouteCost("POST", re.compile(r"/labs/[^/]+/add-users"), 4),
+]
+
+
+def request_cost(method: str, path: str, query_string: bytes) -> int:
+    for route in ROUTE_COSTS:
+        if route.method == method and route.pattern.fullmatch(path):
+            if route.rows_per_weight is None:
+                return route.weight
+            limits = parse_qs(query_string.decode("latin-1")).get("limit", [])
+            try:
+                limit = int(limits[-1]) if limits else route.rows_per_weight
+            except ValueError:
+                limit = route.rows_per_weight
+            return route.weight * max(1, math.ceil(limit / route.rows_per_weight))
+    return 1
+
+
+def user_key(scope: Scope) -> str | None:
+    """
+    The user id from the request's access token, checked but without a
+    database query, or None for anonymous requests.
+    """
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+            )
+            return str(payload["sub"])
+        except (InvalidTokenError, KeyError):
+            pass
+    return None
+
+
+@dataclass
+class UserSlots:
+    in_flight: int = 0
+    # Queued requests in arrival order, with their cost
+    waiters: deque[tuple[int, asyncio.Future[None]]] = field(default_factory=deque)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Caps the cost of the requests each user has in flight on this worker.
+
+    Requests over the cap wait in the user's own queue, first in first out,
+    for up to `queue_timeout` seconds. When the queue is full or the wait
+    runs out, the request gets a 429 with Retry-After. Other users' requests
+    never wait behind them.
+
+    Anonymous requests aren't limited here: behind the proxy they would all
+    share one address.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        capacity: int = 8,
+        queue_size: int = 32,
+        queue_timeout: float = 5.0,
+    ) -> None:
+        self.app = app
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.users: dict[str, UserSlots] = {}
+
+    async def acquire(self, key: str, cost: int) -> bool:
+        slots = self.users.setdefault(key, UserSlots())
+        if not slots.waiters and slots.in_flight + cost <= self.capacity:
+            slots.in_flight += cost
+            return True
+        if len(slots.waiters) >= self.queue_size:
+            self.discard_idle(key)
+            return False
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        slots.waiters.append((cost, waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted just as the wait ran out
+                return True
+            slots.waiters.remove((cost, waiter))
+            self.wake(key)
+            return False
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if waiter.done():
+                self.release(key, cost)
+            else:
+                slots.waiters.remove((cost, waiter))
+                self.wake(key)
+            raise
+
+    def release(self, key: str, cost: int) -> None:
+        self.users[key].in_flight -= cost
+        self.wake(key)
+
+    def wake(self, key: str) -> None:
+        slots = self.users[key]
+        while slots.waiters and slots.in_flight + slots.waiters[0][0] <= self.capacity:
+            cost, waiter = slots.waiters.popleft()
+            slots.in_flight += cost
+            waiter.set_result(None)
+        self.discard_idle(key)
+
+    def discard_idle(self, key: str) -> None:
+        slots = self.users.get(key)
+        if slots is not None and not slots.in_flight and not slots.waiters:
+            del self.users[key]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path: str = scope["path"]
+        if path.startswith(settings.API_V1_STR):
+            path = path[len(settings.API_V1_STR) :]
+        cost = min(
+            request_cost(scope["method"], path, scope.get("query_string", b"")),
+            self.capacity,
+        )
+        key = user_key(scope) if cost else None
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.acquire(key, cost):
+            response = JSONResponse(
+                {"detail": "Too many concurrent requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(self.queue_timeout))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.release(key, cost)
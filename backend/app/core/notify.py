@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import Callable
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with the payload of each notification on its channel, or with None
+# after (re)connecting, when notifications may have been missed
+NotificationHandler = Callable[[str | None], None]
+
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+
+class NotificationListener:
+    """
+    A single Postgres LISTEN connection per worker, dispatching notifications
+    to in-process handlers on the event loop.
+    """
+
+    def __init__(self, conninfo: str) -> None:
+        self.conninfo = conninfo
+        self.handlers: defaultdict[str, list[NotificationHandler]] = defaultdict(list)
+        self._task: asyncio.Task[None] | None = None
+        # Set while LISTEN is active on every channel
+        self.connected = asyncio.Event()
+
+    def add_handler(self, channel: str, handler: NotificationHandler) -> None:
+        self.handlers[channel].append(handler)
+
+    async def start(self) -> None:
+        if self._task is None and self.handlers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.connected.clear()
+
+    def dispatch(self, channel: str, payload: str | None) -> None:
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Notification handler failed on channel %s", channel)
+
+    async def _run(self) -> None:
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                ) as conn:
+                    for channel in self.handlers:
+                        await conn.execute(
+                            sql.SQL("LISTEN {}").format(sql.Identifier(channel))
+                        )
+                    delay = RECONNECT_MIN_DELAY
+                    self.connected.set()
+                    for channel in self.handlers:
+                        self.dispatch(channel, None)
+                    async for notify in conn.notifies():
+                        self.dispatch(notify.channel, notify.payload)
+            except psycopg.Error:
+                logger.warning(
+                    "Notification listener disconnected, retrying in %.0fs", delay
+                )
+            self.connected.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+listener = NotificationListener(
+    str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+psycopg", "postgresql", 1)
+)
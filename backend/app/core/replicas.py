@@ -0,0 +1,167 @@
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import ORMExecuteState
+from sqlmodel import Session, create_engine, func, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.notify import listener
+
+logger = logging.getLogger(__name__)
+
+RECENT_WRITES_CHANNEL = "recent_writes"
+
+# Seconds of WAL the replica has yet to replay, 0 when it is caught up
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaPool:
+    """
+    Round-robin over the read replicas that are reachable and no further
+    behind the primary than `max_lag` seconds.
+    """
+
+    def __init__(
+        self, engines: list[Engine], max_lag: float, check_interval: float
+    ) -> None:
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy: list[Engine] = []
+        self._checked_at = -math.inf
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def replica_lag(self, engine: Engine) -> float:
+        try:
+            with engine.connect() as conn:
+                return float(conn.execute(REPLICA_LAG_QUERY).scalar_one())
+        except DBAPIError:
+            logger.warning("Read replica %s is unreachable", engine.url.host)
+            return math.inf
+
+    def healthy(self) -> list[Engine]:
+        now = time.monotonic()
+        # One request refreshes the lags, the others keep using the last result
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(
+            blocking=False
+        ):
+            try:
+                self._healthy = [
+                    engine
+                    for engine in self.engines
+                    if self.replica_lag(engine) <= self.max_lag
+                ]
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._healthy
+
+    def pick(self) -> Engine | None:
+        """
+        The replica to read from, or None when reads should go to the primary.
+        """
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+
+replica_pool = ReplicaPool(
+    [
+        create_engine(str(uri), connect_args={"connect_timeout": 2})
+        for uri in settings.SQLALCHEMY_REPLICA_URIS
+    ],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+)
+
+# Users that wrote recently, their reads stay on the primary until it expires
+recent_writers: TTLCache[str, bool] = TTLCache(
+    maxsize=65536, ttl=settings.READ_YOUR_WRITES_SECONDS
+)
+
+
+def wrote_recently(user_id: str) -> bool:
+    return recent_writers.get(user_id) is not None
+
+
+def record_recent_write(payload: str | None) -> None:
+    if payload is not None:
+        recent_writers.set(payload, True)
+
+
+def mark_writes(session: Session, *_: Any) -> None:
+    session.info["has_writes"] = True
+
+
+def mark_statement_writes(orm_execute_state: ORMExecuteState) -> None:
+    # Bulk statements skip the flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+def announce_recent_write(session: Session, *_: Any) -> None:
+    """
+    Tell all workers, in the session's transaction, that its user wrote.
+    """
+    user_id: Any = session.info.get("user_id")
+    if user_id is None or not session.info.pop("has_writes", False):
+        return
+    if not session.info.get("announced_write"):
+        session.info["announced_write"] = True
+        session.connection().execute(
+            select(func.pg_notify(RECENT_WRITES_CHANNEL, user_id))
+        )
+
+
+def flush_before_commit(session: Session) -> None:
+    # commit() only flushes after before_commit, the objects still pending
+    # have to be written now for the write to be announced
+    session.flush()
+    announce_recent_write(session)
+
+
+def record_committed_write(session: Session) -> None:
+    """
+    Keep the reads of the session's user on the primary, once it committed a
+    write.
+    """
+    if session.info.pop("announced_write", False):
+        record_recent_write(session.info["user_id"])
+
+
+def forget_writes(session: Session, *_: Any) -> None:
+    session.info.pop("has_writes", None)
+    session.info.pop("announced_write", None)
+
+
+def track_writes(target: type[Session] | Session) -> None:
+    """
+    Announce the writes of the sessions of `target`, a session or the Session
+    class, to read-your-writes routing.
+    """
+    event.listen(target, "after_flush", mark_writes)
+    event.listen(target, "do_orm_execute", mark_statement_writes)
+    event.listen(target, "after_flush_postexec", announce_recent_write)
+    event.listen(target, "before_commit", flush_before_commit)
+    event.listen(target, "after_commit", record_committed_write)
+    event.listen(target, "after_rollback", forget_writes)
+
+
+if replica_pool.engines:
+    listener.add_handler(RECENT_WRITES_CHANNEL, record_recent_write)
+    track_writes(Session)
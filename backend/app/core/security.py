@@ -1,27 +1,94 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
 import jwt
-from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
 
 
 ALGORITHM = "HS256"
 
+# Bits of the lab permission masks carried in access tokens
+CAN_EDIT_LAB = 1
+CAN_EDIT_ITEMS = 2
+CAN_EDIT_USERS = 4
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+
+def lab_permission_mask(
+    can_edit_lab: bool, can_edit_items: bool, can_edit_users: bool
+) -> int:
+    return (
+        (CAN_EDIT_LAB if can_edit_lab else 0)
+        | (CAN_EDIT_ITEMS if can_edit_items else 0)
+        | (CAN_EDIT_USERS if can_edit_users else 0)
+    )
+
+
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta,
+    lab_permissions: dict[str, int] | None = None,
+    permissions_version: int | None = None,
+) -> str:
+    """
+    Create an access token, optionally carrying the user's permission mask in
+    each of their labs along with the permissions version they were read at.
+    """
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode: dict[str, Any] = {"exp": expire, "sub": str(subject)}
+    if lab_permissions is not None and permissions_version is not None:
+        to_encode["labs"] = lab_permissions
+        to_encode["pv"] = permissions_version
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def generate_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are random, so a keyed hash is enough and much cheaper than bcrypt
+    return hmac.new(
+        settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+@lru_cache
+def get_pwd_context() -> "CryptContext":
+    # passlib and bcrypt are only imported once a password is checked or hashed
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        # Hashes of a lower or higher cost are both redone
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """
+    Verify a password, also returning a new hash of it when the stored hash
+    wasn't made with the current settings.
+    """
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
@@ -0,0 +1,152 @@
+import math
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Protocol
+
+from sqlalchemy import Engine, text
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import engine
+
+
+@dataclass(frozen=True)
+class BucketLimit:
+    # Attempts allowed in a burst
+    size: int
+    # Attempts regained per second
+    refill_rate: float
+
+
+class BucketStore(Protocol):
+    def take(self, key: str, limit: BucketLimit) -> float:
+        """
+        Take a token from the bucket, returns 0 when one was left, otherwise
+        the seconds until there is one.
+        """
+        ...
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in this worker's memory, each worker counts separately.
+    """
+
+    def __init__(self, maxsize: int = 65536) -> None:
+        # (tokens, monotonic time they were counted at) by key
+        self.buckets: TTLCache[str, tuple[float, float]] = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: BucketLimit) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key) or (float(limit.size), now)
+            tokens = min(limit.size, tokens + (now - updated_at) * limit.refill_rate)
+            if tokens >= 1:
+                self.buckets.set(key, (tokens - 1, now))
+                return 0.0
+            self.buckets.set(key, (tokens, now))
+            return (1 - tokens) / limit.refill_rate
+
+
+# Refills and takes a token in one statement, leaves the bucket untouched
+# and returns no row when it is empty
+TAKE_TOKEN = text("""
+    INSERT INTO throttle_bucket AS bucket (bucket_key, tokens, updated_at)
+    VALUES (:key, :size - 1, clock_timestamp())
+    ON CONFLICT (bucket_key) DO UPDATE SET
+        tokens = least(:size, bucket.tokens + extract(epoch FROM clock_timestamp() - bucket.updated_at) * :rate) - 1,
+        updated_at = clock_timestamp()
+    WHERE least(:size, bucket.tokens + extract(epoch FROM clock_timestamp() - bucket.updated_at) * :rate) >= 1
+    RETURNING tokens
+""")
+READ_TOKENS = text("""
+    SELECT least(:size, tokens + extract(epoch FROM clock_timestamp() - updated_at) * :rate)
+    FROM throttle_bucket WHERE bucket_key = :key
+""")
+# Buckets untouched for this long are full again, and can go
+DELETE_IDLE = text("""
+    DELETE FROM throttle_bucket WHERE updated_at < clock_timestamp() - interval '1 day'
+""")
+
+
+class PostgresBucketStore:
+    """
+    Token buckets in the throttle_bucket table, shared by all workers.
+    """
+
+    def __init__(self, db_engine: Engine, cleanup_probability: float = 0.001) -> None:
+        self.engine = db_engine
+        self.cleanup_probability = cleanup_probability
+
+    def take(self, key: str, limit: BucketLimit) -> float:
+        params = {"key": key, "size": limit.size, "rate": limit.refill_rate}
+        with self.engine.begin() as conn:
+            if random.random() < self.cleanup_probability:
+                conn.execute(DELETE_IDLE)
+            if conn.execute(TAKE_TOKEN, params).first() is not None:
+                return 0.0
+            tokens = conn.execute(READ_TOKENS, params).scalar_one_or_none() or 0.0
+        return (1 - float(tokens)) / limit.refill_rate
+
+
+class LoginThrottle:
+    """
+    Limits login and password recovery attempts per client address and per
+    account, before any password is hashed. Counts its decisions for
+    monitoring.
+    """
+
+    def __init__(
+        self, store: BucketStore, per_ip: BucketLimit, per_account: BucketLimit
+    ) -> None:
+        self.store = store
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.counters: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def check(self, action: str, ip: str, account: str) -> int:
+        """
+        0 when the attempt may go ahead, otherwise the seconds to wait.
+        """
+        retry_after = self.store.take(f"{action}:ip:{ip}", self.per_ip)
+        if retry_after:
+            self.count(f"{action}_rejected_ip")
+            return math.ceil(retry_after)
+        retry_after = self.store.take(
+            f"{action}:account:{account.lower()}", self.per_account
+        )
+        if retry_after:
+            self.count(f"{action}_rejected_account")
+            return math.ceil(retry_after)
+        self.count(f"{action}_allowed")
+        return 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+login_throttle = LoginThrottle(
+    PostgresBucketStore(engine)
+    if settings.LOGIN_THROTTLE_STORE == "postgres"
+    else MemoryBucketStore(),
+    per_ip=BucketLimit(
+        size=settings.LOGIN_ATTEMPTS_PER_IP,
+        refill_rate=settings.LOGIN_ATTEMPTS_PER_IP
+        / settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+    ),
+    per_account=BucketLimit(
+        size=settings.LOGIN_ATTEMPTS_PER_ACCOUNT,
+        refill_rate=settings.LOGIN_ATTEMPTS_PER_ACCOUNT
+        / settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+    ),
+)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import uuid
+from contextlib import ExitStack
+
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import configure_mappers
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Item, Lab, User
+from app.utils import load_email_templates
+
+logger = logging.getLogger(__name__)
+
+# Set once the worker is warmed up, see the readiness check
+ready = asyncio.Event()
+
+
+def prime_pool(db_engine: Engine, size: int) -> None:
+    """
+    Open `size` connections at once, so they all stay in the pool.
+    """
+    with ExitStack() as stack:
+        for _ in range(size):
+            conn = stack.enter_context(db_engine.connect())
+            conn.execute(text("SELECT 1"))
+
+
+def compile_hot_statements(db_engine: Engine) -> None:
+    """
+    Run the queries made on most requests once, so their compiled SQL is in
+    the engine's statement cache. Their results don't matter.
+    """
+    nil = uuid.UUID(int=0)
+    with Session(db_engine) as session:
+        # Authentication and login
+        session.get(User, nil)
+        crud.get_user_by_email(session=session, email="")
+        crud.get_lab_permission_masks(
+            session=session, user_id=nil, max_labs=settings.ACCESS_TOKEN_MAX_LABS
+        )
+        # Listing and lookup routes
+        crud.get_table_version(session=session, table_names=["lab"])
+        session.get(Lab, nil)
+        session.get(Item, nil)
+        session.rollback()
+
+
+def warm_up_database(db_engine: Engine) -> None:
+    try:
+        prime_pool(db_engine, settings.DB_POOL_SIZE)
+        compile_hot_statements(db_engine)
+    except DBAPIError:
+        # Not fatal, the connections and statements are set up on first use
+        logger.exception("Database warmup failed")
+
+
+async def warm_up() -> None:
+    """
+    Do the one-off work the first requests of a worker would otherwise wait for.
+    """
+    configure_mappers()
+    if settings.emails_enabled:
+        load_email_templates()
+    await asyncio.to_thread(warm_up_database, engine)
+    ready.set()
@@ -1,12 +1,26 @@
 import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import Select, column, literal_column, table, true, tuple_, union
+from sqlmodel import Session, col, delete, func, select, update
 
-from app.core.security import get_password_hash, verify_password
-from app.models import (Item, ItemCreate, 
-                        Lab, LabCreate,
-                        User, UserCreate, UserUpdate)
+from app.core.invalidation import MISSING_USERS_CACHE, USERS_CACHE, bus
+from app.core.security import (
+    generate_refresh_token,
+    get_password_hash,
+    hash_refresh_token,
+    lab_permission_mask,
+    verify_and_update_password,
+)
+from app.models import (ChangeLog, ChangeLogHorizon, FacetCount, Item, ItemCreate, ItemFacets,
+                        Lab, LabCreate, RefreshToken,
+                        User, UserCreate, UserLab, UserUpdate)
+
+
+def publish_user_email(*, session: Session, email: str) -> None:
+    # The email has a user once the session commits
+    bus.publish(session=session, name=MISSING_USERS_CACHE, key=f"email:{email}")
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -14,6 +28,7 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
         user_create, update={"hashed_password": get_password_hash(user_create.password)}
     )
     session.add(db_obj)
+    publish_user_email(session=session, email=db_obj.email)
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -26,8 +41,12 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
         password = user_data["password"]
         hashed_password = get_password_hash(password)
         extra_data["hashed_password"] = hashed_password
+        revoke_refresh_tokens(session=session, user_id=db_user.user_id)
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
+    bus.publish(session=session, name=USERS_CACHE, key=str(db_user.user_id))
+    if "email" in user_data:
+        publish_user_email(session=session, email=db_user.email)
     session.commit()
     session.refresh(db_user)
     return db_user
@@ -43,11 +62,115 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # The hash was made with other settings, the password is only known now
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        bus.publish(session=session, name=USERS_CACHE, key=str(db_user.user_id))
+        session.commit()
+        session.refresh(db_user)
     return db_user
 
 
+def get_lab_permission_masks(
+    *, session: Session, user_id: uuid.UUID, max_labs: int
+) -> dict[str, int] | None:
+    """
+    Permission masks of a user's lab memberships by lab id, or None when the
+    user is a member of more than `max_labs` labs.
+    """
+    user_labs = session.exec(
+        select(UserLab).where(UserLab.user_id == user_id).limit(max_labs + 1)
+    ).all()
+    if len(user_labs) > max_labs:
+        return None
+    return {
+        str(user_lab.lab_id): lab_permission_mask(
+            user_lab.can_edit_lab, user_lab.can_edit_items, user_lab.can_edit_users
+        )
+        for user_lab in user_labs
+    }
+
+
+def create_refresh_token(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    expires_delta: timedelta,
+    family_id: uuid.UUID | None = None,
+) -> str:
+    """
+    Store a new refresh token for a user and return it, clearing the user's
+    expired ones on the way.
+    """
+    now = datetime.now(timezone.utc)
+    session.exec(
+        delete(RefreshToken).where(
+            col(RefreshToken.user_id) == user_id, col(RefreshToken.expires_at) <= now
+        )
+    )
+    token = generate_refresh_token()
+    db_obj = RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=hash_refresh_token(token),
+        expires_at=now + expires_delta,
+    )
+    session.add(db_obj)
+    session.commit()
+    return token
+
+
+def rotate_refresh_token(
+    *, session: Session, token: str, expires_delta: timedelta
+) -> tuple[User, str] | None:
+    """
+    Exchange a refresh token for a new one of the same family.
+
+    A token that was already rotated is likely stolen, presenting it again
+    revokes the whole family.
+    """
+    now = datetime.now(timezone.utc)
+    db_obj = session.exec(
+        select(RefreshToken)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+        .with_for_update()
+    ).first()
+    if not db_obj or db_obj.expires_at <= now:
+        return None
+    if db_obj.revoked_at is not None:
+        session.exec(
+            update(RefreshToken)
+            .where(
+                col(RefreshToken.family_id) == db_obj.family_id,
+                col(RefreshToken.revoked_at).is_(None),
+            )
+            .values(revoked_at=now)
+        )
+        session.commit()
+        return None
+
+    db_obj.revoked_at = now
+    session.add(db_obj)
+    new_token = create_refresh_token(
+        session=session,
+        user_id=db_obj.user_id,
+        expires_delta=expires_delta,
+        family_id=db_obj.family_id,
+    )
+    user = session.get(User, db_obj.user_id)
+    if not user:
+        return None
+    return user, new_token
+
+
+def revoke_refresh_tokens(*, session: Session, user_id: uuid.UUID) -> None:
+    session.exec(delete(RefreshToken).where(col(RefreshToken.user_id) == user_id))
+
+
 def create_item(*, session: Session, item_in: ItemCreate, lab_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"lab_id": lab_id})
     session.add(db_item)
@@ -62,3 +185,137 @@ def create_lab(*, session: Session, lab_in: LabCreate, owner_id: uuid.UUID) -> L
     session.refresh(db_lab)
     return db_lab
 
+
+
+def accessible_lab_ids(*, user_id: uuid.UUID) -> Any:
+    """
+    Subquery of the ids of the labs a user owns or is a member of.
+    """
+    owned = select(Lab.lab_id).where(Lab.owner_id == user_id)
+    member = select(UserLab.lab_id).where(UserLab.user_id == user_id)
+    return union(owned, member)
+
+
+def get_item_facets(*, session: Session, lab_id: uuid.UUID, filters: list[Any]) -> ItemFacets:
+    """
+    Count the items of a lab per vendor, per parameter value and per availability
+    in a single GROUPING SETS query.
+    """
+    available = Item.quantity > literal_column("0")
+    param = func.jsonb_each_text(Item.item_params).table_valued("key", "value").lateral()
+    statement = (
+        select(  # type: ignore[call-overload]
+            func.grouping(Item.item_vendor),
+            func.grouping(available),
+            col(Item.item_vendor),
+            available,
+            param.c.key,
+            param.c.value,
+            func.count(col(Item.item_id).distinct()),
+        )
+        .select_from(Item)
+        .outerjoin(param, true())
+        .where(Item.lab_id == lab_id, *filters)
+        .group_by(
+            func.grouping_sets(
+                tuple_(Item.item_vendor),
+                tuple_(available),
+                tuple_(param.c.key, param.c.value),
+            )
+        )
+    )
+
+    facets = ItemFacets(vendors=[], params={}, available=0, unavailable=0)
+    for vendor_grouped, available_grouped, vendor, is_available, key, value, count in session.exec(statement):
+        if not vendor_grouped:
+            facets.vendors.append(FacetCount(value=vendor, count=count))
+        elif not available_grouped:
+            if is_available:
+                facets.available = count
+            else:
+                facets.unavailable = count
+        elif key is not None:
+            facets.params.setdefault(key, []).append(FacetCount(value=value, count=count))
+    facets.vendors.sort(key=lambda facet: -facet.count)
+    for values in facets.params.values():
+        values.sort(key=lambda facet: -facet.count)
+    return facets
+
+
+def get_table_version(*, session: Session, table_names: list[str]) -> int:
+    """
+    Combined change counter of the given tables, the rows inserted into and
+    deleted from them according to the statistics collector. Writes of the
+    session's own transaction count at once, those of others a moment after
+    they end. Nothing is locked or written to keep it.
+    """
+    stats, xact_stats = (
+        table(name, column("relid"), column("n_tup_ins"), column("n_tup_del"))
+        # The second has the writes of the current transaction, not reported
+        # to the collector yet
+        for name in ("pg_stat_user_tables", "pg_stat_xact_user_tables")
+    )
+    statement = (
+        select(
+            func.coalesce(
+                func.sum(
+                    stats.c.n_tup_ins
+                    + stats.c.n_tup_del
+                    + xact_stats.c.n_tup_ins
+                    + xact_stats.c.n_tup_del
+                ),
+                0,
+            )
+        )
+        .select_from(stats.join(xact_stats, stats.c.relid == xact_stats.c.relid))
+        .where(stats.c.relid.in_([func.to_regclass(name) for name in table_names]))
+    )
+    return int(session.exec(statement).one())
+
+
+def estimate_table_rows(*, session: Session, table_name: str) -> int | None:
+    """
+    Planner row estimate of a whole table, None when it was never analyzed.
+    """
+    pg_class = table("pg_class", column("oid"), column("reltuples"))
+    statement = select(pg_class.c.reltuples).where(
+        pg_class.c.oid == func.to_regclass(table_name)
+    )
+    reltuples = session.exec(statement).first()
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+def estimate_statement_rows(*, session: Session, statement: Select[Any]) -> int:
+    """
+    Planner row estimate of a query, read from its EXPLAIN output.
+    """
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def compact_change_log(*, session: Session, retention: timedelta) -> int:
+    """
+    Delete change log entries older than `retention` and move the horizon past
+    them, returning the number of deleted entries.
+
+    Entries are removed by transaction id, so sync tokens below the new
+    horizon are all rejected instead of silently missing changes.
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+    xmin = session.exec(select(func.txid_snapshot_xmin(func.txid_current_snapshot()))).one()
+    oldest_kept = session.exec(
+        select(func.min(ChangeLog.tx_id)).where(ChangeLog.changed_at >= cutoff)
+    ).one()
+    bound = min(xmin, oldest_kept) if oldest_kept is not None else xmin
+
+    result = session.exec(delete(ChangeLog).where(col(ChangeLog.tx_id) < bound))
+    horizon = session.get(ChangeLogHorizon, 1) or ChangeLogHorizon()
+    horizon.tx_id = max(horizon.tx_id, bound)
+    session.add(horizon)
+    session.commit()
+    return result.rowcount
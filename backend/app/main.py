@@ -1,23 +1,56 @@
-import sentry_sdk
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.api.openapi import openapi_document, serve_cached_openapi
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.limiter import ConcurrencyLimitMiddleware
+from app.core.notify import listener
+from app.core.warmup import ready, warm_up
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await listener.start()
+    openapi_document.prepare(app)
+    await warm_up()
+    yield
+    ready.clear()
+    await listener.stop()
+
+
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
+    import sentry_sdk
+
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    capacity=settings.USER_CONCURRENCY_LIMIT,
+    queue_size=settings.USER_QUEUE_SIZE,
+    queue_timeout=settings.USER_QUEUE_TIMEOUT_SECONDS,
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSION_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
 # Set all CORS enabled origins
@@ -31,3 +64,4 @@ if settings.all_cors_origins:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+serve_cached_openapi(app)
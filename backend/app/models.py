@@ -1,6 +1,11 @@
 import uuid
+from datetime import datetime
+from typing import Annotated, Any, Literal
 
 from pydantic import EmailStr
+from pydantic import Field as PydanticField
+from sqlalchemy import BigInteger, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -43,6 +48,8 @@ class UpdatePassword(SQLModel):
 class User(UserBase, table=True):
     user_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
+    # Bumped by a database trigger whenever the user's lab memberships change
+    permissions_version: int = Field(default=0)
     labs: list["Lab"] = Relationship(back_populates="owner")
     user_labs: list["UserLab"] = Relationship(back_populates="user")
     borrowings: list["Borrowing"] = Relationship(back_populates="user")
@@ -55,7 +62,7 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    count: int | None
 
 
 # Shared properties for Lab
@@ -80,7 +87,9 @@ class LabUpdate(LabBase):
 # Database model for Lab, database table inferred from class name
 class Lab(LabBase, table=True):
     lab_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    owner_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False, ondelete="CASCADE")
+    owner_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False, ondelete="CASCADE", index=True)
+    # Bumped by a database trigger on every write to the lab's items
+    items_version: int = Field(default=0)
     owner: User | None = Relationship(back_populates="labs")
     items: list["Item"] = Relationship(back_populates="lab")
     user_labs: list["UserLab"] = Relationship(back_populates="lab")
@@ -92,8 +101,41 @@ class LabPublic(LabBase):
     owner_id: uuid.UUID
 
 
+# Lab as listed for a user, with the user's relation to it
+class LabWithPermissionsPublic(LabPublic):
+    is_owner: bool = False
+    can_edit_lab: bool = False
+    can_edit_items: bool = False
+    can_edit_users: bool = False
+
+
 class LabsPublic(SQLModel):
-    data: list[LabPublic]
+    data: list[LabWithPermissionsPublic]
+    count: int | None
+
+
+# Shared properties for LabStats
+class LabStatsBase(SQLModel):
+    item_count: int = Field(default=0)
+    total_quantity: int = Field(default=0)
+    active_borrows: int = Field(default=0)
+    member_count: int = Field(default=0)
+
+
+# Database model for LabStats, kept up to date by database triggers on
+# item, borrowing and user_lab writes
+class LabStats(LabStatsBase, table=True):
+    __tablename__ = "lab_stats"
+    lab_id: uuid.UUID = Field(foreign_key="lab.lab_id", primary_key=True, ondelete="CASCADE")
+
+
+# Properties to return via API for LabStats
+class LabStatsPublic(LabStatsBase):
+    lab_id: uuid.UUID
+
+
+class LabsStatsPublic(SQLModel):
+    data: list[LabStatsPublic]
     count: int
 
 
@@ -103,7 +145,7 @@ class ItemBase(SQLModel):
     quantity: int = Field(default=0)
     item_img_url: str | None = Field(default=None, max_length=255)
     item_vendor: str | None = Field(default=None, max_length=255) 
-    item_params: str | None = Field(default=None, max_length=255)
+    item_params: dict[str, Any] | None = Field(default=None, sa_type=JSONB(none_as_null=True))
     lab_id: uuid.UUID = Field(foreign_key="lab.lab_id", nullable=False, ondelete="CASCADE")
 
 
@@ -118,12 +160,40 @@ class ItemUpdate(ItemBase):
     quantity: int | None = Field(default=None)
     item_img_url: str | None = Field(default=None, max_length=255)
     item_vendor: str | None = Field(default=None, max_length=255)
-    item_params: str | None = Field(default=None, max_length=255)
+    item_params: dict[str, Any] | None = Field(default=None, sa_type=JSONB(none_as_null=True))
     lab_id: uuid.UUID | None = Field(default=None, foreign_key="lab.lab_id", ondelete="CASCADE")
 
 
 # Database model for Item, database table inferred from class name
 class Item(ItemBase, table=True):
+    # Trigram GIN indexes backing item search (requires the pg_trgm extension)
+    __table_args__ = (
+        Index(
+            "ix_item_item_name_trgm",
+            "item_name",
+            postgresql_using="gin",
+            postgresql_ops={"item_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_item_item_vendor_trgm",
+            "item_vendor",
+            postgresql_using="gin",
+            postgresql_ops={"item_vendor": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_item_item_params_trgm",
+            text("(item_params::text) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        # Containment (@>) index backing parameter filters on item listings
+        Index(
+            "ix_item_item_params_gin",
+            "item_params",
+            postgresql_using="gin",
+            postgresql_ops={"item_params": "jsonb_path_ops"},
+        ),
+    )
+
     item_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     lab_id: uuid.UUID = Field(foreign_key="lab.lab_id", nullable=False, ondelete="CASCADE")
     lab: Lab | None = Relationship(back_populates="items")
@@ -136,13 +206,33 @@ class ItemPublic(ItemBase):
     lab_id: uuid.UUID
 
 
+class FacetCount(SQLModel):
+    value: str | None
+    count: int
+
+
+class ItemFacets(SQLModel):
+    vendors: list[FacetCount]
+    params: dict[str, list[FacetCount]]
+    available: int
+    unavailable: int
+
+
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    count: int | None
+    facets: ItemFacets | None = None
+
 
+class ItemsSearchPublic(SQLModel):
+    data: list[ItemPublic]
+    next_cursor: str | None = None
 
-# Database model for UserLab, database table inferred from class name
+
+# Database model for UserLab, table name matches the one created by the migrations
 class UserLab(SQLModel, table=True):
+    __tablename__ = "user_lab"
+    __table_args__ = (Index("ix_user_lab_user_id_lab_id", "user_id", "lab_id"),)
     userlab_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False, ondelete="CASCADE")
     lab_id: uuid.UUID = Field(foreign_key="lab.lab_id", nullable=False, ondelete="CASCADE")
@@ -152,6 +242,22 @@ class UserLab(SQLModel, table=True):
     user: User | None = Relationship(back_populates="user_labs")
     lab: Lab | None = Relationship(back_populates="user_labs")
 
+
+# Properties to return via API for the current user's lab memberships, joined with their lab
+class MyLabPublic(LabBase):
+    userlab_id: uuid.UUID
+    lab_id: uuid.UUID
+    owner_id: uuid.UUID
+    can_edit_lab: bool
+    can_edit_items: bool
+    can_edit_users: bool
+
+
+class MyLabsPublic(SQLModel):
+    data: list[MyLabPublic]
+    next_cursor: str | None = None
+
+
 class AddUsersToLab(SQLModel):
     emails: list[EmailStr]
     can_edit_lab: bool = False
@@ -167,8 +273,77 @@ class RemoveUsersFromLab(SQLModel):
     emails: EmailStr
 
 
+# Operations accepted by the lab batch endpoint, discriminated by "op"
+class BatchCreateItem(SQLModel):
+    op: Literal["create_item"]
+    item_in: ItemCreate
+
+
+class BatchUpdateItem(SQLModel):
+    op: Literal["update_item"]
+    item_id: uuid.UUID
+    item_in: ItemUpdate
+
+
+class BatchDeleteItem(SQLModel):
+    op: Literal["delete_item"]
+    item_id: uuid.UUID
+
+
+class BatchAddMember(UpdateUserLab):
+    op: Literal["add_member"]
+    email: EmailStr
+
+
+class BatchUpdateMember(UpdateUserLab):
+    op: Literal["update_member"]
+    email: EmailStr
+
+
+class BatchRemoveMember(SQLModel):
+    op: Literal["remove_member"]
+    email: EmailStr
+
+
+BatchOperation = Annotated[
+    BatchCreateItem
+    | BatchUpdateItem
+    | BatchDeleteItem
+    | BatchAddMember
+    | BatchUpdateMember
+    | BatchRemoveMember,
+    PydanticField(discriminator="op"),
+]
+
+
+class BatchRequest(SQLModel):
+    operations: list[BatchOperation] = Field(min_length=1, max_length=500)
+    # Roll back every operation when any of them fails
+    atomic: bool = False
+
+
+class BatchOperationResult(SQLModel):
+    index: int
+    status_code: int
+    detail: str | None = None
+    item: ItemPublic | None = None
+
+
+class BatchResults(SQLModel):
+    results: list[BatchOperationResult]
+
+
 # Database model for Borrowing, database table inferred from class name
 class Borrowing(SQLModel, table=True):
+    # Serves the newest-first borrowing history of a user
+    __table_args__ = (
+        Index(
+            "ix_borrowing_user_id_history",
+            "user_id",
+            text("coalesce(borrowed_at, '')"),
+            "borrow_id",
+        ),
+    )
     borrow_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False, ondelete="CASCADE")
     item_id: uuid.UUID = Field(foreign_key="item.item_id", nullable=False, ondelete="CASCADE")
@@ -177,6 +352,25 @@ class Borrowing(SQLModel, table=True):
     user: User | None = Relationship(back_populates="borrowings")
     item: Item | None = Relationship(back_populates="borrowings")
 
+
+# Properties to return via API for the current user's borrowings, joined with their item and lab
+class MyBorrowingPublic(SQLModel):
+    borrow_id: uuid.UUID
+    item_id: uuid.UUID
+    borrowed_at: str | None
+    returned_at: str | None
+    item_name: str
+    lab_id: uuid.UUID
+    lab_place: str | None
+    lab_university: str | None
+    lab_num: str | None
+
+
+class MyBorrowingsPublic(SQLModel):
+    data: list[MyBorrowingPublic]
+    next_cursor: str | None = None
+
+
 class BorrowItem(SQLModel):
     start_date: str 
     end_date: str | None = Field(default=None)
@@ -184,6 +378,89 @@ class BorrowItem(SQLModel):
     system_name: str
 
 
+# Database model for IdempotencyKey, the stored outcome of a request sent with an
+# Idempotency-Key header. response_body stays empty while the request is running.
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_key"
+    user_id: uuid.UUID = Field(foreign_key="user.user_id", primary_key=True, ondelete="CASCADE")
+    key: str = Field(primary_key=True, max_length=255)
+    request_hash: str = Field(max_length=64)
+    status_code: int | None = Field(default=None)
+    response_body: Any | None = Field(default=None, sa_type=JSONB(none_as_null=True))
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+
+
+# Database model for ChangeLog, appended to by database triggers on every item,
+# borrowing and membership write. tx_id is the writing transaction's id.
+class ChangeLog(SQLModel, table=True):
+    __tablename__ = "change_log"
+    __table_args__ = (Index("ix_change_log_lab_id_tx_id_seq", "lab_id", "tx_id", "seq"),)
+    seq: int | None = Field(default=None, sa_type=BigInteger, primary_key=True)
+    tx_id: int = Field(sa_type=BigInteger)
+    lab_id: uuid.UUID
+    entity: str = Field(max_length=16)
+    entity_id: uuid.UUID
+    op: str = Field(max_length=6)
+    changed_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+
+
+# Database model for ChangeLogHorizon, a single row holding the transaction id
+# below which the change log has been compacted
+class ChangeLogHorizon(SQLModel, table=True):
+    __tablename__ = "change_log_horizon"
+    horizon_id: int = Field(default=1, primary_key=True)
+    tx_id: int = Field(default=0, sa_type=BigInteger)
+
+
+# Properties to return via API for a borrowing
+class BorrowingPublic(SQLModel):
+    borrow_id: uuid.UUID
+    user_id: uuid.UUID
+    item_id: uuid.UUID
+    borrowed_at: str | None
+    returned_at: str | None
+
+
+# Properties to return via API for a lab membership
+class UserLabPublic(UpdateUserLab):
+    userlab_id: uuid.UUID
+    user_id: uuid.UUID
+    lab_id: uuid.UUID
+
+
+# Rows of a lab changed since a sync token, and the token to sync from next
+class LabChangesPublic(SQLModel):
+    items: list[ItemPublic]
+    borrowings: list[BorrowingPublic]
+    members: list[UserLabPublic]
+    deleted_item_ids: list[uuid.UUID]
+    deleted_borrow_ids: list[uuid.UUID]
+    deleted_userlab_ids: list[uuid.UUID]
+    next_token: str
+    has_more: bool
+
+
+# Database model for RefreshToken, only an HMAC of the token is stored. Tokens
+# rotated from the same login share a family_id.
+class RefreshToken(SQLModel, table=True):
+    __tablename__ = "refresh_token"
+    refresh_token_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False, ondelete="CASCADE", index=True)
+    family_id: uuid.UUID = Field(index=True)
+    token_hash: str = Field(max_length=64, unique=True, index=True)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True))
+    revoked_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+# Database model for ThrottleBucket, the shared token buckets of login
+# throttling when LOGIN_THROTTLE_STORE is "postgres"
+class ThrottleBucket(SQLModel, table=True):
+    __tablename__ = "throttle_bucket"
+    bucket_key: str = Field(max_length=320, primary_key=True)
+    tokens: float
+    updated_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+
+
 # Generic message
 class Message(SQLModel):
     message: str
@@ -193,11 +470,19 @@ class Message(SQLModel):
 class Token(SQLModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: str | None = None
+
+
+class RefreshTokenRequest(SQLModel):
+    refresh_token: str
 
 
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    # Lab id to permission mask, valid while the user's permissions_version is pv
+    labs: dict[str, int] | None = None
+    pv: int | None = None
 
 
 class NewPassword(SQLModel):
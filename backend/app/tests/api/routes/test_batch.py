@@ -0,0 +1,105 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.config import settings
+from app.models import Item, ItemCreate, LabCreate, UserLab
+from app.tests.utils.user import create_random_user
+
+
+def test_run_lab_batch(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    member = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    item = crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name="Foo", lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+    data = {
+        "operations": [
+            {
+                "op": "create_item",
+                "item_in": {
+                    "item_name": "Bar",
+                    "quantity": 2,
+                    "lab_id": str(lab.lab_id),
+                },
+            },
+            {
+                "op": "update_item",
+                "item_id": str(item.item_id),
+                "item_in": {"quantity": 7},
+            },
+            {"op": "delete_item", "item_id": str(uuid.uuid4())},
+            {"op": "add_member", "email": member.email, "can_edit_items": True},
+        ]
+    }
+    response = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/batch",
+        headers=superuser_token_headers,
+        json=data,
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [200, 200, 404, 200]
+    assert results[0]["item"]["item_name"] == "Bar"
+    assert results[1]["item"]["quantity"] == 7
+    assert results[2]["detail"] == "Item not found"
+
+    db.expire_all()
+    items = db.exec(select(Item).where(Item.lab_id == lab.lab_id)).all()
+    assert len(items) == 2
+    user_lab = db.exec(
+        select(UserLab).where(
+            UserLab.lab_id == lab.lab_id, UserLab.user_id == member.user_id
+        )
+    ).first()
+    assert user_lab
+    assert user_lab.can_edit_items
+
+
+def test_run_lab_batch_atomic(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    data = {
+        "atomic": True,
+        "operations": [
+            {
+                "op": "create_item",
+                "item_in": {"item_name": "Bar", "lab_id": str(lab.lab_id)},
+            },
+            {"op": "remove_member", "email": "missing@example.com"},
+        ],
+    }
+    response = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/batch",
+        headers=superuser_token_headers,
+        json=data,
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status_code"] for result in results] == [424, 404]
+    items = db.exec(select(Item).where(Item.lab_id == lab.lab_id)).all()
+    assert items == []
+
+
+def test_run_lab_batch_not_enough_permissions(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    data = {"operations": [{"op": "delete_item", "item_id": str(uuid.uuid4())}]}
+    response = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/batch",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough permissions"
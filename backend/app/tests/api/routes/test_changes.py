@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import ItemCreate, LabCreate
+from app.tests.utils.user import create_random_user
+
+
+# Changes only show up once the transaction that made them has finished
+@pytest.mark.commits
+def test_read_lab_changes(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    kept = crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name="Kept", lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+    removed = crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name="Removed", lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/changes",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert {item["item_name"] for item in content["items"]} == {"Kept", "Removed"}
+    token = content["next_token"]
+
+    kept.quantity = 5
+    db.add(kept)
+    db.delete(removed)
+    db.commit()
+    added = crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name="Added", lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/changes",
+        headers=superuser_token_headers,
+        params={"since": token},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert {item["item_id"]: item["quantity"] for item in content["items"]} == {
+        str(kept.item_id): 5,
+        str(added.item_id): 0,
+    }
+    assert content["deleted_item_ids"] == [str(removed.item_id)]
+    assert content["has_more"] is False
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/changes",
+        headers=superuser_token_headers,
+        params={"since": content["next_token"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    crud.compact_change_log(session=db, retention=timedelta(0))
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/changes",
+        headers=superuser_token_headers,
+        params={"since": token},
+    )
+    assert response.status_code == 410
+
+
+def test_read_lab_changes_invalid_token(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/changes",
+        headers=superuser_token_headers,
+        params={"since": "not-a-token"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
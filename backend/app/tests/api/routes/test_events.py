@@ -0,0 +1,66 @@
+import asyncio
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.api.routes.events import RESYNC_MESSAGE, SUBSCRIBER_QUEUE_SIZE, LabEventBroker
+from app.core.config import settings
+from app.models import LabCreate
+from app.tests.utils.user import create_random_user
+
+
+def test_lab_event_broker_fan_out() -> None:
+    async def run() -> None:
+        broker = LabEventBroker()
+        lab_id = str(uuid.uuid4())
+        first = broker.subscribe(lab_id)
+        second = broker.subscribe(lab_id)
+        other = broker.subscribe(str(uuid.uuid4()))
+
+        payload = json.dumps({"type": "borrowing", "op": "INSERT", "lab_id": lab_id})
+        broker.publish(payload)
+        assert first.get_nowait() == f"event: borrowing\ndata: {payload}\n\n"
+        assert second.get_nowait() == f"event: borrowing\ndata: {payload}\n\n"
+        assert other.empty()
+
+        broker.publish(None)
+        assert other.get_nowait() == RESYNC_MESSAGE
+        assert first.get_nowait() == RESYNC_MESSAGE
+
+        for _ in range(SUBSCRIBER_QUEUE_SIZE + 1):
+            broker.publish(payload)
+        assert first.qsize() == 1
+        assert first.get_nowait() == RESYNC_MESSAGE
+
+        broker.unsubscribe(lab_id, first)
+        broker.unsubscribe(lab_id, second)
+        assert lab_id not in broker.subscribers
+
+    asyncio.run(run())
+
+
+def test_read_lab_events_not_found(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{uuid.uuid4()}/events",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Lab not found"
+
+
+def test_read_lab_events_not_enough_permissions(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/events",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough permissions"
@@ -3,9 +3,12 @@ import uuid
 from fastapi.testclient import TestClient
 from sqlmodel import Session
 
+from app import crud
 from app.core.config import settings
+from app.models import ItemCreate, LabCreate
 from app.tests.utils.item import create_random_item
 from app.tests.utils.labs import create_random_lab
+from app.tests.utils.user import create_random_user
 
 
 def test_create_item(
@@ -27,6 +30,34 @@ def test_create_item(
     assert content["lab_id"] == str(lab.lab_id)
 
 
+def test_create_item_idempotency_key(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    lab = crud.create_lab(
+        session=db, lab_in=LabCreate(), owner_id=create_random_user(db).user_id
+    )
+    headers = {**superuser_token_headers, "Idempotency-Key": str(uuid.uuid4())}
+    data = {"item_name": "Foo", "quantity": 3, "lab_id": str(lab.lab_id)}
+    response = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items", headers=headers, json=data
+    )
+    assert response.status_code == 200
+    replayed = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items", headers=headers, json=data
+    )
+    assert replayed.status_code == 200
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert replayed.json()["item_id"] == response.json()["item_id"]
+
+    response = client.post(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=headers,
+        json={"item_name": "Bar", "quantity": 3, "lab_id": str(lab.lab_id)},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Idempotency-Key was already used for a different request"
+
+
 def test_read_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -86,6 +117,113 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_sparse_fields(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    item_in = ItemCreate(
+        item_name="Foo", quantity=3, item_vendor="Acme", item_params={"pins": 8}, lab_id=lab.lab_id
+    )
+    item = crud.create_item(session=db, item_in=item_in, lab_id=lab.lab_id)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"fields": "item_name,quantity"},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["data"] == [
+        {"item_name": "Foo", "quantity": 3, "item_id": str(item.item_id)}
+    ]
+    assert content["count"] == 1
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"fields": "item_name,owner_id"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid fields: owner_id"
+
+
+def test_read_items_filtered_by_params(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    for params in ({"voltage": "5V", "pins": 8}, {"voltage": "12V", "pins": 8}, None):
+        item_in = ItemCreate(item_name="Foo", item_params=params, lab_id=lab.lab_id)
+        crud.create_item(session=db, item_in=item_in, lab_id=lab.lab_id)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"param.voltage": "5V"},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["count"] == 1
+    assert content["data"][0]["item_params"] == {"voltage": "5V", "pins": 8}
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"param.pins": "8"},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
+
+
+def test_read_items_with_facets(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    for vendor, quantity, params in (
+        ("Acme", 3, {"voltage": "5V"}),
+        ("Acme", 0, {"voltage": "12V"}),
+        ("Globex", 1, {"voltage": "5V"}),
+    ):
+        item_in = ItemCreate(
+            item_name="Foo",
+            item_vendor=vendor,
+            quantity=quantity,
+            item_params=params,
+            lab_id=lab.lab_id,
+        )
+        crud.create_item(session=db, item_in=item_in, lab_id=lab.lab_id)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"facets": True},
+    )
+    assert response.status_code == 200
+    facets = response.json()["facets"]
+    assert facets["vendors"] == [
+        {"value": "Acme", "count": 2},
+        {"value": "Globex", "count": 1},
+    ]
+    assert facets["params"]["voltage"] == [
+        {"value": "5V", "count": 2},
+        {"value": "12V", "count": 1},
+    ]
+    assert facets["available"] == 2
+    assert facets["unavailable"] == 1
+
+    # A write to the lab's items invalidates the cached facets
+    item_in = ItemCreate(item_name="Bar", item_vendor="Globex", quantity=1, lab_id=lab.lab_id)
+    crud.create_item(session=db, item_in=item_in, lab_id=lab.lab_id)
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+        headers=superuser_token_headers,
+        params={"facets": True},
+    )
+    assert response.json()["facets"]["available"] == 3
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -3,7 +3,9 @@ import uuid
 from fastapi.testclient import TestClient
 from sqlmodel import Session
 
+from app import crud
 from app.core.config import settings
+from app.models import ItemCreate, LabCreate, UserLab
 from app.tests.utils import create_random_user
 from app.tests.utils.labs import create_random_lab
 
@@ -78,6 +80,85 @@ def test_read_labs(
     assert content["count"] >= 2
 
 
+def test_read_labs_includes_member_labs(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    owned_lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=user.user_id)
+    owner = create_random_user(db)
+    member_lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    other_lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    db.add(UserLab(user_id=user.user_id, lab_id=member_lab.lab_id, can_edit_items=True))
+    db.commit()
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/",
+        headers=normal_user_token_headers,
+        params={"limit": 1000},
+    )
+    assert response.status_code == 200
+    labs = {lab["lab_id"]: lab for lab in response.json()["data"]}
+    assert labs[str(owned_lab.lab_id)]["is_owner"] is True
+    assert labs[str(member_lab.lab_id)]["is_owner"] is False
+    assert labs[str(member_lab.lab_id)]["can_edit_items"] is True
+    assert labs[str(member_lab.lab_id)]["can_edit_lab"] is False
+    assert str(other_lab.lab_id) not in labs
+
+
+def test_read_labs_sparse_fields(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    owner = create_random_user(db)
+    member_lab = crud.create_lab(
+        session=db, lab_in=LabCreate(lab_num="101"), owner_id=owner.user_id
+    )
+    db.add(UserLab(user_id=user.user_id, lab_id=member_lab.lab_id, can_edit_items=True))
+    db.commit()
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/",
+        headers=normal_user_token_headers,
+        params={"limit": 1000, "fields": "lab_num,is_owner,can_edit_items"},
+    )
+    assert response.status_code == 200
+    labs = {lab["lab_id"]: lab for lab in response.json()["data"]}
+    assert labs[str(member_lab.lab_id)] == {
+        "lab_id": str(member_lab.lab_id),
+        "lab_num": "101",
+        "is_owner": False,
+        "can_edit_items": True,
+    }
+
+
+def test_read_labs_stats(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=user.user_id)
+    for quantity in (2, 3):
+        item_in = ItemCreate(item_name="Foo", quantity=quantity, lab_id=lab.lab_id)
+        crud.create_item(session=db, item_in=item_in, lab_id=lab.lab_id)
+    member = create_random_user(db)
+    db.add(UserLab(user_id=member.user_id, lab_id=lab.lab_id))
+    db.commit()
+
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/stats",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    stats = next(s for s in content["data"] if s["lab_id"] == str(lab.lab_id))
+    assert stats["item_count"] == 2
+    assert stats["total_quantity"] == 5
+    assert stats["active_borrows"] == 0
+    assert stats["member_count"] == 1
+
+
 def test_update_lab(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
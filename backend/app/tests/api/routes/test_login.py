@@ -1,11 +1,17 @@
+from datetime import timedelta
 from unittest.mock import patch
 
+import jwt
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
+from app import crud
+from app.core import security
 from app.core.config import settings
 from app.core.security import verify_password
-from app.models import User
+from app.models import LabCreate, User, UserCreate, UserLab
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_email, random_lower_string
 from app.utils import generate_password_reset_token
 
 
@@ -30,6 +36,55 @@ def test_get_access_token_incorrect_password(client: TestClient) -> None:
     assert r.status_code == 400
 
 
+def test_get_access_token_throttled(client: TestClient) -> None:
+    login_data = {
+        "username": random_email(),
+        "password": "incorrect",
+    }
+    for _ in range(settings.LOGIN_ATTEMPTS_PER_ACCOUNT):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+        assert r.status_code == 400
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) > 0
+
+
+def test_refresh_access_token(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    refresh_token = r.json()["refresh_token"]
+    assert refresh_token
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    assert r.status_code == 200
+    tokens = r.json()
+    assert tokens["refresh_token"] != refresh_token
+    r = client.post(
+        f"{settings.API_V1_STR}/login/test-token",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert r.status_code == 200
+
+    # Reusing a rotated token revokes the tokens rotated from it too
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid refresh token"
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == 400
+
+
 def test_use_access_token(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -42,6 +97,58 @@ def test_use_access_token(
     assert "email" in result
 
 
+def test_access_token_lab_permission_claims(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.create_user(
+        session=db, user_create=UserCreate(email=email, password=password)
+    )
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    db.add(UserLab(user_id=user.user_id, lab_id=lab.lab_id, can_edit_items=True))
+    db.commit()
+    db.refresh(user)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/access-token",
+        data={"username": email, "password": password},
+    )
+    assert r.status_code == 200
+    payload = jwt.decode(
+        r.json()["access_token"], settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+    )
+    assert payload["labs"] == {str(lab.lab_id): security.CAN_EDIT_ITEMS}
+    assert payload["pv"] == user.permissions_version
+
+
+def test_stale_lab_permission_claims_are_not_trusted(
+    client: TestClient, db: Session
+) -> None:
+    user = create_random_user(db)
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    claims = {str(lab.lab_id): security.CAN_EDIT_ITEMS}
+
+    def assert_create_item(permissions_version: int, status_code: int) -> None:
+        token = security.create_access_token(
+            user.user_id,
+            expires_delta=timedelta(minutes=5),
+            lab_permissions=claims,
+            permissions_version=permissions_version,
+        )
+        r = client.post(
+            f"{settings.API_V1_STR}/labs/{lab.lab_id}/items",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"item_name": "Foo", "lab_id": str(lab.lab_id)},
+        )
+        assert r.status_code == status_code
+
+    # Current claims are trusted without looking up the membership
+    assert_create_item(user.permissions_version, 200)
+    # Claims from before a membership change fall back to the database
+    assert_create_item(user.permissions_version - 1, 400)
+
+
 def test_recovery_password(
     client: TestClient, normal_user_token_headers: dict[str, str]
 ) -> None:
@@ -69,6 +176,24 @@ def test_recovery_password_user_not_exits(
     assert r.status_code == 404
 
 
+def test_recovery_password_user_created_after_not_found(
+    client: TestClient, db: Session
+) -> None:
+    email = random_email()
+    r = client.post(f"{settings.API_V1_STR}/password-recovery/{email}")
+    assert r.status_code == 404
+    # Remembered as missing until a user gets the email
+    crud.create_user(
+        session=db, user_create=UserCreate(email=email, password=random_lower_string())
+    )
+    with (
+        patch("app.core.config.settings.SMTP_HOST", "smtp.example.com"),
+        patch("app.core.config.settings.SMTP_USER", "admin@example.com"),
+    ):
+        r = client.post(f"{settings.API_V1_STR}/password-recovery/{email}")
+    assert r.status_code == 200
+
+
 def test_reset_password(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
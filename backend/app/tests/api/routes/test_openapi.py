@@ -0,0 +1,48 @@
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.openapi import etag_matches, openapi_document
+from app.core.config import settings
+from app.main import app
+
+
+def test_openapi_cached(client: TestClient) -> None:
+    url = f"{settings.API_V1_STR}/openapi.json"
+    response = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json() == app.openapi()
+    etag = response.headers["etag"]
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == etag
+    assert response.json() == app.openapi()
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == app.openapi()
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+
+def test_etag_matches() -> None:
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches("", '"a"')
+
+
+def test_openapi_gzipped_body_matches() -> None:
+    openapi_document.build(app)
+    assert openapi_document.body is not None
+    assert gzip.decompress(openapi_document.encoded["gzip"]) == openapi_document.body
+    assert json.loads(openapi_document.body) == app.openapi()
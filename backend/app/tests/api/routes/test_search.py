@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import ItemCreate, LabCreate
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def test_search_lab_items(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    name = f"oscilloscope {random_lower_string()}"
+    crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name=name, lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/labs/{lab.lab_id}/items/search",
+        headers=superuser_token_headers,
+        params={"q": "oscilloscope"},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [item["item_name"] for item in content["data"]] == [name]
+    assert content["next_cursor"] is None
+
+
+def test_search_items_only_in_accessible_labs(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    name = random_lower_string()
+    crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name=name, lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=normal_user_token_headers,
+        params={"q": name},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+
+
+def test_search_items_pagination(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    lab = crud.create_lab(session=db, lab_in=LabCreate(), owner_id=owner.user_id)
+    prefix = random_lower_string()
+    for _ in range(3):
+        crud.create_item(
+            session=db,
+            item_in=ItemCreate(item_name=f"{prefix} resistor", lab_id=lab.lab_id),
+            lab_id=lab.lab_id,
+        )
+    seen: list[str] = []
+    cursor = None
+    for _ in range(3):
+        params = {"q": prefix, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(
+            f"{settings.API_V1_STR}/labs/{lab.lab_id}/items/search",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        seen.extend(item["item_id"] for item in content["data"])
+        cursor = content["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 3
+    assert len(set(seen)) == 3
+
+
+def test_search_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=superuser_token_headers,
+        params={"q": "foo", "cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
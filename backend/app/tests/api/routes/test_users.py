@@ -7,7 +7,7 @@ from sqlmodel import Session, select
 from app import crud
 from app.core.config import settings
 from app.core.security import verify_password
-from app.models import User, UserCreate
+from app.models import Borrowing, ItemCreate, LabCreate, User, UserCreate, UserLab
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -56,6 +56,51 @@ def test_create_user_new_email(
         assert user.email == created_user["email"]
 
 
+def test_retrieve_users_count_strategies(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "exact"},
+    )
+    exact = r.json()["count"]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "cached"},
+    )
+    assert r.json()["count"] == exact
+
+    crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "cached"},
+    )
+    assert r.json()["count"] == exact + 1
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "estimated"},
+    )
+    assert r.status_code == 200
+    assert isinstance(r.json()["count"], int)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "none"},
+    )
+    assert r.status_code == 200
+    assert r.json()["count"] is None
+
+
 def test_get_existing_user(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -168,6 +213,19 @@ def test_retrieve_users(
         assert "email" in item
 
 
+def test_retrieve_users_sparse_fields(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"fields": "email"},
+    )
+    assert r.status_code == 200
+    for user in r.json()["data"]:
+        assert set(user) == {"email", "user_id"}
+
+
 def test_update_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -484,3 +542,93 @@ def test_delete_user_without_privileges(
     )
     assert r.status_code == 403
     assert r.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_view_my_borrowings(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    lab = crud.create_lab(
+        session=db, lab_in=LabCreate(lab_num="42"), owner_id=user.user_id
+    )
+    item = crud.create_item(
+        session=db,
+        item_in=ItemCreate(item_name="Multimeter", lab_id=lab.lab_id),
+        lab_id=lab.lab_id,
+    )
+    db.add(
+        Borrowing(
+            user_id=user.user_id,
+            item_id=item.item_id,
+            borrowed_at="2030-01-01T00:00:00",
+        )
+    )
+    db.add(
+        Borrowing(
+            user_id=user.user_id,
+            item_id=item.item_id,
+            borrowed_at="2030-01-02T00:00:00",
+            returned_at="2030-01-03T00:00:00",
+        )
+    )
+    db.commit()
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me/borrows",
+        headers=normal_user_token_headers,
+        params={"borrowed_from": "2030-01-01T00:00:00", "limit": 1},
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert len(content["data"]) == 1
+    assert content["data"][0]["borrowed_at"] == "2030-01-02T00:00:00"
+    assert content["data"][0]["item_name"] == "Multimeter"
+    assert content["data"][0]["lab_num"] == "42"
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me/borrows",
+        headers=normal_user_token_headers,
+        params={
+            "borrowed_from": "2030-01-01T00:00:00",
+            "limit": 1,
+            "cursor": content["next_cursor"],
+        },
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [b["borrowed_at"] for b in content["data"]] == ["2030-01-01T00:00:00"]
+    assert content["next_cursor"] is None
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me/borrows",
+        headers=normal_user_token_headers,
+        params={"borrowed_from": "2030-01-01T00:00:00", "status": "active"},
+    )
+    assert [b["borrowed_at"] for b in r.json()["data"]] == ["2030-01-01T00:00:00"]
+
+
+def test_view_my_labs(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    owner = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    lab = crud.create_lab(
+        session=db, lab_in=LabCreate(lab_place="Room 1"), owner_id=owner.user_id
+    )
+    db.add(UserLab(user_id=user.user_id, lab_id=lab.lab_id, can_edit_items=True))
+    db.commit()
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me/labs", headers=normal_user_token_headers
+    )
+    assert r.status_code == 200
+    memberships = [m for m in r.json()["data"] if m["lab_id"] == str(lab.lab_id)]
+    assert len(memberships) == 1
+    assert memberships[0]["lab_place"] == "Room 1"
+    assert memberships[0]["can_edit_items"] is True
+    assert memberships[0]["can_edit_lab"] is False
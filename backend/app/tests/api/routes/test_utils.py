@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.warmup import ready
+
+
+def test_readiness_check(client: TestClient) -> None:
+    # The client has run the app's startup, warmup included
+    response = client.get(f"{settings.API_V1_STR}/utils/ready/")
+    assert response.status_code == 200
+    assert response.json() is True
+
+    ready.clear()
+    try:
+        response = client.get(f"{settings.API_V1_STR}/utils/ready/")
+        assert response.status_code == 503
+    finally:
+        ready.set()
@@ -1,27 +1,150 @@
+import os
+import subprocess
+import sys
 from collections.abc import Generator
+from pathlib import Path
+from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, delete
+from sqlalchemy import Engine, make_url, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, create_engine
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
 from app.core.config import settings
-from app.core.db import engine, init_db
-from app.main import app
-from app.models import Item, User
-from app.tests.utils.user import authentication_token_from_email
-from app.tests.utils.utils import get_superuser_token_headers
 
+# Every test run gets a fresh template database with the migrations applied,
+# and every xdist worker its own clone of it. Point the app at the clone
+# before the engine and the notification listener are created.
+TEMPLATE_DB = f"{settings.POSTGRES_DB}_test_template"
+WORKER_DB = (
+    f"{settings.POSTGRES_DB}_test_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}"
+)
+settings.POSTGRES_DB = WORKER_DB
 
-@pytest.fixture(scope="session", autouse=True)
-def db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+from app.api.deps import get_db  # noqa: E402
+from app.core.db import engine, init_db  # noqa: E402
+from app.core.invalidation import bus  # noqa: E402
+from app.core.throttle import MemoryBucketStore, login_throttle  # noqa: E402
+from app.main import app  # noqa: E402
+from app.tests.utils.user import authentication_token_from_email  # noqa: E402
+from app.tests.utils.utils import get_superuser_token_headers  # noqa: E402
+
+BACKEND_DIR = Path(__file__).parents[2]
+
+
+def database_engine(name: str, **kwargs: Any) -> Engine:
+    url = make_url(str(settings.SQLALCHEMY_DATABASE_URI)).set(database=name)
+    return create_engine(url, poolclass=NullPool, **kwargs)
+
+
+def admin_engine() -> Engine:
+    # CREATE and DROP DATABASE can't run in a transaction, nor from the
+    # database they act on
+    return database_engine("postgres", isolation_level="AUTOCOMMIT")
+
+
+def recreate_database(admin: Engine, name: str, template: str | None = None) -> None:
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+        if template is None:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+        else:
+            conn.execute(text(f'CREATE DATABASE "{name}" TEMPLATE "{template}"'))
+
+
+def build_template_database() -> None:
+    admin = admin_engine()
+    recreate_database(admin, TEMPLATE_DB)
+    admin.dispose()
+
+    # Same as scripts/prestart.sh, but on the template
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "POSTGRES_DB": TEMPLATE_DB},
+        check=True,
+    )
+    template_engine = database_engine(TEMPLATE_DB)
+    with Session(template_engine) as session:
         init_db(session)
-        yield session
-        statement = delete(Item)
-        session.execute(statement)
-        statement = delete(User)
-        session.execute(statement)
-        session.commit()
+    template_engine.dispose()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "commits: run the test on a session that really commits, for tests of "
+        "what happens after a commit (NOTIFY, transaction snapshots)",
+    )
+    # Only the controlling process builds the template, xdist workers start
+    # after it is done
+    if not hasattr(config, "workerinput"):
+        build_template_database()
+
+
+# Another worker may still be cloning the template
+@retry(
+    retry=retry_if_exception_type(OperationalError),
+    stop=stop_after_attempt(20),
+    wait=wait_fixed(0.5),
+    reraise=True,
+)
+def clone_template_database(admin: Engine) -> None:
+    recreate_database(admin, WORKER_DB, template=TEMPLATE_DB)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def worker_database() -> Generator[None, None, None]:
+    admin = admin_engine()
+    clone_template_database(admin)
+    yield
+    engine.dispose()
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{WORKER_DB}"'))
+    admin.dispose()
+
+
+@pytest.fixture(autouse=True)
+def db(request: pytest.FixtureRequest) -> Generator[Session, None, None]:
+    """
+    The test's session. Everything the test and the requests it makes write
+    is rolled back afterwards: they share one outer transaction, in which
+    their commits only release SAVEPOINTs.
+    """
+    if request.node.get_closest_marker("commits"):
+        with Session(engine) as session:
+            yield session
+        return
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+
+        def get_test_db() -> Generator[Session, None, None]:
+            with Session(
+                bind=connection, join_transaction_mode="create_savepoint"
+            ) as session:
+                yield session
+
+        app.dependency_overrides[get_db] = get_test_db
+        try:
+            with Session(
+                bind=connection, join_transaction_mode="create_savepoint"
+            ) as session:
+                yield session
+        finally:
+            del app.dependency_overrides[get_db]
+            transaction.rollback()
+            # Cached rows may come from the rolled back writes
+            bus.handle(None)
+
+
+@pytest.fixture(autouse=True)
+def login_throttle_buckets() -> None:
+    # Every test starts with its login attempts unused
+    login_throttle.store = MemoryBucketStore()
 
 
 @pytest.fixture(scope="module")
@@ -36,7 +159,9 @@ def superuser_token_headers(client: TestClient) -> dict[str, str]:
 
 
 @pytest.fixture(scope="module")
-def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]:
-    return authentication_token_from_email(
-        client=client, email=settings.EMAIL_TEST_USER, db=db
-    )
+def normal_user_token_headers(client: TestClient) -> dict[str, str]:
+    # Outlives the tests of the module, so its user is committed for real
+    with Session(engine) as session:
+        return authentication_token_from_email(
+            client=client, email=settings.EMAIL_TEST_USER, db=session
+        )
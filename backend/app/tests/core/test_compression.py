@@ -0,0 +1,95 @@
+import gzip
+from typing import Any
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+LARGE = {"items": [{"item_name": f"item {i}", "quantity": i} for i in range(100)]}
+
+
+@app.get("/small")
+def small() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.get("/large")
+def large() -> dict[str, list[dict[str, object]]]:
+    return LARGE
+
+
+@app.get("/stream")
+def stream() -> StreamingResponse:
+    return StreamingResponse((f"row {i}\n" for i in range(100)), media_type="text/csv")
+
+
+@app.get("/events")
+def events() -> StreamingResponse:
+    return StreamingResponse(iter(["data: 1\n\n"] * 50), media_type="text/event-stream")
+
+
+@app.get("/encoded")
+def encoded() -> PlainTextResponse:
+    return PlainTextResponse("x" * 500, headers={"Content-Encoding": "identity"})
+
+
+client = TestClient(app)
+
+
+def test_negotiate_encoding() -> None:
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") == negotiate_encoding("br, gzip")
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+
+def test_compression_minimum_size() -> None:
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == LARGE
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == LARGE
+
+
+def test_compression_reuses_compressed_body() -> None:
+    client.get("/small")
+    middleware: Any = app.middleware_stack
+    while not isinstance(middleware, CompressionMiddleware):
+        middleware = middleware.app
+    middleware.cache.clear()
+
+    first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert len(middleware.cache) == 1
+    second = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert len(middleware.cache) == 1
+    assert first.json() == second.json() == LARGE
+
+
+def test_compression_streaming() -> None:
+    with client.stream(
+        "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+    ) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw).decode() == "".join(f"row {i}\n" for i in range(100))
+
+
+def test_compression_skips_event_streams_and_encoded_bodies() -> None:
+    response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "identity"
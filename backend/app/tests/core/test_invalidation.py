@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from sqlmodel import Session
+
+from app.core.cache import TTLCache
+from app.core.invalidation import USERS_CACHE, InvalidationBus
+from app.core.notify import NotificationListener, listener
+
+
+@pytest.mark.commits
+def test_invalidation_reaches_every_worker(db: Session) -> None:
+    async def run() -> None:
+        # Two workers, each with its own listener connection, bus and cache
+        workers = []
+        for _ in range(2):
+            worker_listener = NotificationListener(listener.conninfo)
+            worker_bus = InvalidationBus()
+            cache = worker_bus.register(USERS_CACHE, TTLCache[str, str](maxsize=16))
+            worker_bus.subscribe(worker_listener)
+            await worker_listener.start()
+            await asyncio.wait_for(worker_listener.connected.wait(), 10)
+            cache.set("stale", "value")
+            cache.set("fresh", "value")
+            workers.append((worker_listener, worker_bus, cache))
+
+        try:
+            publisher = workers[0][1]
+            publisher.publish(session=db, name=USERS_CACHE, key="stale")
+            db.commit()
+
+            for _ in range(50):
+                if all(cache.get("stale") is None for _, _, cache in workers):
+                    break
+                await asyncio.sleep(0.1)
+            for _, _, cache in workers:
+                assert cache.get("stale") is None
+                assert cache.get("fresh") == "value"
+        finally:
+            for worker_listener, _, _ in workers:
+                await worker_listener.stop()
+
+    asyncio.run(run())
+
+
+def test_invalidation_bus_skips_fill_after_eviction() -> None:
+    bus = InvalidationBus()
+    cache = bus.register(USERS_CACHE, TTLCache[str, str](maxsize=16))
+
+    generation = bus.generation(USERS_CACHE)
+    bus.handle('{"cache": "users", "key": "user"}')
+    bus.set_if_current(USERS_CACHE, "user", "loaded before the write", generation)
+    assert cache.get("user") is None
+
+    generation = bus.generation(USERS_CACHE)
+    bus.set_if_current(USERS_CACHE, "user", "loaded after the write", generation)
+    assert cache.get("user") == "loaded after the write"
+
+    bus.handle(None)
+    assert len(cache) == 0
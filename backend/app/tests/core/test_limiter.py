@@ -0,0 +1,103 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.limiter import ConcurrencyLimitMiddleware, request_cost, user_key
+from app.core.security import create_access_token
+
+
+def test_request_cost() -> None:
+    assert request_cost("GET", "/labs/1/items", b"") == 2
+    assert request_cost("GET", "/labs/1/items", b"limit=1000") == 20
+    assert request_cost("GET", "/labs/1/items/2", b"") == 1
+    assert request_cost("POST", "/labs/1/batch", b"") == 4
+    assert request_cost("GET", "/labs/1/events", b"") == 0
+
+
+def test_user_key() -> None:
+    token = create_access_token("user-id", timedelta(minutes=5))
+    scope = {
+        "type": "http",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    assert user_key(scope) == "user-id"
+    scope = {"type": "http", "headers": [(b"authorization", b"Bearer invalid")]}
+    assert user_key(scope) is None
+
+
+def test_limiter_queues_then_rejects() -> None:
+    async def run() -> None:
+        release = asyncio.Event()
+        statuses: list[int] = []
+
+        async def app(_scope, _receive, send) -> None:  # type: ignore[no-untyped-def]
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        limiter = ConcurrencyLimitMiddleware(
+            app, capacity=2, queue_size=1, queue_timeout=0.2
+        )
+        token = create_access_token("user-id", timedelta(minutes=5))
+
+        async def request(path: str) -> None:
+            scope = {
+                "type": "http",
+                "method": "GET",
+                "path": f"{settings.API_V1_STR}{path}",
+                "query_string": b"",
+                "headers": [(b"authorization", f"Bearer {token}".encode())],
+            }
+
+            async def send(message) -> None:  # type: ignore[no-untyped-def]
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await limiter(scope, None, send)  # type: ignore[arg-type]
+
+        # The listing takes both slots, the next request queues, the one
+        # after finds the queue full
+        running = asyncio.create_task(request("/labs/1/items"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(request("/labs/1"))
+        await asyncio.sleep(0)
+        await request("/labs/2")
+        assert statuses == [429]
+
+        # The queued request times out
+        await queued
+        assert statuses == [429, 429]
+
+        release.set()
+        await running
+        assert statuses == [429, 429, 200]
+        assert limiter.users == {}
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("cancel_granted", [False, True])
+def test_limiter_wakes_queued_requests(cancel_granted: bool) -> None:
+    async def run() -> None:
+        limiter = ConcurrencyLimitMiddleware(lambda *_: None, capacity=1)  # type: ignore[arg-type]
+        assert await limiter.acquire("user", 1)
+        waiting = asyncio.create_task(limiter.acquire("user", 1))
+        await asyncio.sleep(0)
+        limiter.release("user", 1)
+        if cancel_granted:
+            # The client goes away just as its turn comes
+            waiting.cancel()
+            try:
+                granted = await waiting
+            except asyncio.CancelledError:
+                granted = False
+        else:
+            granted = await waiting
+            assert granted
+        if granted:
+            limiter.release("user", 1)
+        assert limiter.users == {}
+
+    asyncio.run(run())
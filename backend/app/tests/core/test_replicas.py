@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, create_engine, select
+
+from app.core.replicas import (
+    ReplicaPool,
+    recent_writers,
+    record_recent_write,
+    track_writes,
+    wrote_recently,
+)
+from app.models import User
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def test_replica_pool_skips_lagging_replicas(monkeypatch: pytest.MonkeyPatch) -> None:
+    fresh = create_engine("sqlite://")
+    lagging = create_engine("sqlite://")
+    lags = {fresh: 0.5, lagging: 30.0}
+    pool = ReplicaPool([fresh, lagging], max_lag=5.0, check_interval=0)
+
+    def replica_lag(engine: Engine) -> float:
+        return lags[engine]
+
+    monkeypatch.setattr(pool, "replica_lag", replica_lag)
+    assert {pool.pick() for _ in range(4)} == {fresh}
+
+    lags[lagging] = 1.0
+    assert {pool.pick() for _ in range(4)} == {fresh, lagging}
+
+    lags[fresh] = lags[lagging] = float("inf")
+    assert pool.pick() is None
+
+
+def test_recent_write_keeps_reads_on_primary() -> None:
+    user_id = str(uuid.uuid4())
+    assert not wrote_recently(user_id)
+    record_recent_write(user_id)
+    assert wrote_recently(user_id)
+
+
+def test_committed_write_keeps_reads_on_primary(db: Session) -> None:
+    user_id = str(uuid.uuid4())
+    track_writes(db)
+    db.info["user_id"] = user_id
+    # Added and committed without a flush in between
+    db.add(User(email=random_email(), hashed_password=random_lower_string()))
+    db.commit()
+    assert wrote_recently(user_id)
+
+    recent_writers.pop(user_id)
+    db.exec(select(User)).all()
+    db.commit()
+    assert not wrote_recently(user_id)
@@ -0,0 +1,33 @@
+from app.core.throttle import BucketLimit, LoginThrottle, MemoryBucketStore
+
+
+def test_memory_bucket_store() -> None:
+    store = MemoryBucketStore()
+    limit = BucketLimit(size=2, refill_rate=0.5)
+    assert store.take("key", limit) == 0
+    assert store.take("key", limit) == 0
+    assert 0 < store.take("key", limit) <= 2
+    # Buckets are separate per key
+    assert store.take("other", limit) == 0
+
+
+def test_login_throttle() -> None:
+    throttle = LoginThrottle(
+        MemoryBucketStore(),
+        per_ip=BucketLimit(size=3, refill_rate=0.01),
+        per_account=BucketLimit(size=1, refill_rate=0.01),
+    )
+    assert throttle.check("login", "10.0.0.1", "a@example.com") == 0
+    # Accounts are matched regardless of case
+    assert throttle.check("login", "10.0.0.2", "A@example.com") > 0
+    assert throttle.check("recovery", "10.0.0.1", "a@example.com") == 0
+    assert throttle.check("login", "10.0.0.1", "b@example.com") == 0
+    assert throttle.check("login", "10.0.0.1", "c@example.com") == 0
+    # The address' attempts are used up, whichever account they are for
+    assert throttle.check("login", "10.0.0.1", "d@example.com") > 0
+    assert throttle.stats() == {
+        "login_allowed": 3,
+        "login_rejected_account": 1,
+        "login_rejected_ip": 1,
+        "recovery_allowed": 1,
+    }
@@ -1,7 +1,9 @@
 from fastapi.encoders import jsonable_encoder
+from passlib.hash import bcrypt
 from sqlmodel import Session
 
 from app import crud
+from app.core.config import settings
 from app.core.security import verify_password
 from app.models import User, UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
@@ -26,6 +28,26 @@ def test_authenticate_user(db: Session) -> None:
     assert user.email == authenticated_user.email
 
 
+def test_authenticate_user_rehashes_password(db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=email, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    # Hashed with another cost than BCRYPT_ROUNDS
+    user.hashed_password = bcrypt.using(rounds=settings.BCRYPT_ROUNDS - 1).hash(
+        password
+    )
+    db.add(user)
+    db.commit()
+    authenticated_user = crud.authenticate(session=db, email=email, password=password)
+    assert authenticated_user
+    assert (
+        bcrypt.from_string(authenticated_user.hashed_password).rounds
+        == settings.BCRYPT_ROUNDS
+    )
+    assert verify_password(password, authenticated_user.hashed_password)
+
+
 def test_not_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -1,17 +1,19 @@
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import emails  # type: ignore
 import jwt
-from jinja2 import Template
 from jwt.exceptions import InvalidTokenError
 
 from app.core import security
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from jinja2 import Template
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -22,11 +24,24 @@ class EmailData:
     subject: str
 
 
+EMAIL_TEMPLATES_DIR = Path(__file__).parent / "email-templates" / "build"
+
+
+@lru_cache
+def get_email_template(template_name: str) -> "Template":
+    from jinja2 import Template
+
+    template: Template = Template((EMAIL_TEMPLATES_DIR / template_name).read_text())
+    return template
+
+
+def load_email_templates() -> None:
+    for path in EMAIL_TEMPLATES_DIR.glob("*.html"):
+        get_email_template(path.name)
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
+    html_content = get_email_template(template_name).render(context)
     return html_content
 
 
@@ -37,6 +52,8 @@ def send_email(
     html_content: str = "",
 ) -> None:
     assert settings.emails_enabled, "no provided configuration for email variables"
+    import emails
+
     message = emails.Message(
         subject=subject,
         html=html_content,
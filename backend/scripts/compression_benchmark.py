@@ -0,0 +1,86 @@
+"""
+Compare response compression settings on a listing-sized JSON body.
+
+For gzip at a few levels, and brotli at a few qualities when it is installed,
+reports the compressed size and the CPU time to compress a body, next to the
+time to look up an already compressed body in the middleware's cache.
+
+    python scripts/compression_benchmark.py --items 500
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import string
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.core.compression import brotli, compress  # noqa: E402
+
+
+def listing_body(items: int) -> bytes:
+    # Shaped like a page of GET /labs/{lab_id}/items
+    def word() -> str:
+        return "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 12)))
+
+    lab_id = str(uuid.uuid4())
+    data = [
+        {
+            "item_id": str(uuid.uuid4()),
+            "lab_id": lab_id,
+            "item_name": f"{word()} {word()}",
+            "quantity": random.randint(0, 20),
+            "item_img_url": None,
+            "item_vendor": word(),
+            "item_params": {word(): word() for _ in range(3)},
+        }
+        for _ in range(items)
+    ]
+    return json.dumps({"data": data, "count": items}).encode()
+
+
+def cpu_time(function: Callable[[], object], runs: int) -> float:
+    start = time.process_time()
+    for _ in range(runs):
+        function()
+    return (time.process_time() - start) / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    body = listing_body(args.items)
+    print(f"{len(body)} bytes uncompressed, {args.items} items")
+    print(f"{'encoding':<12}{'bytes':>10}{'ratio':>8}{'compress':>12}")
+
+    settings = [("gzip", level, 6) for level in (1, 6, 9)]
+    if brotli is not None:
+        settings += [("br", 6, quality) for quality in (1, 4, 11)]
+    else:
+        print("(brotli is not installed)")
+    for encoding, level, quality in settings:
+        compressed = compress(body, encoding, level, quality)
+        seconds = cpu_time(partial(compress, body, encoding, level, quality), args.runs)
+        name = f"{encoding}-{level if encoding == 'gzip' else quality}"
+        print(
+            f"{name:<12}{len(compressed):>10}{len(body) / len(compressed):>8.1f}"
+            f"{seconds * 1000:>10.2f}ms"
+        )
+
+    # A cache hit only costs the digest of the body
+    seconds = cpu_time(partial(hashlib.blake2b, body, digest_size=16), args.runs)
+    print(f"{'cache hit':<12}{'':>18}{seconds * 1000:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure how long importing the app takes, as a worker does when it boots.
+
+Runs `python -X importtime -c "import app.main"` a few times in fresh
+interpreters, reports the best run and the slowest modules of it, and exits
+with 1 when the best run is over the budget.
+
+    python scripts/import_time.py --budget 1.0 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parents[1]
+
+
+def measure(module: str) -> dict[str, int]:
+    """
+    Cumulative import time in microseconds of each module imported by `module`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "0"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, _, timings = line.partition(":")
+        _, total, name = timings.split("|")
+        cumulative[name.strip()] = int(total)
+    return cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget", type=float, default=1.0, help="seconds allowed for the best run"
+    )
+    args = parser.parse_args()
+
+    # The first run may still be writing bytecode caches
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda run: run[args.module])
+    total = best[args.module] / 1_000_000
+
+    print(f"import {args.module}: {total:.3f}s (best of {args.runs})")
+    slowest = sorted(best.items(), key=lambda item: -item[1])
+    for name, microseconds in slowest[1 : args.top + 1]:
+        print(f"  {microseconds / 1000:8.1f}ms  {name}")
+
+    if total > args.budget:
+        print(f"Over the budget of {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
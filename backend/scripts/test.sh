@@ -3,6 +3,7 @@
 set -e
 set -x
 
-coverage run --source=app -m pytest
+# One xdist worker per core, each on its own clone of the test database
+pytest -n "${PYTEST_WORKERS:-auto}" --cov=app --cov-report=
 coverage report --show-missing
 coverage html --title "${@-coverage}"
@@ -4,7 +4,7 @@ set -e
 set -x
 
 cd backend
-python -c "import app.main; import json; print(json.dumps(app.main.app.openapi()))" > ../openapi.json
+python app/build_openapi.py ../openapi.json
 cd ..
 node frontend/modify-openapi-operationids.js
 mv openapi.json frontend/